@@ -0,0 +1,44 @@
+"""
+account_cache.py
+----------------
+TTL cache for private account data (balance) with explicit write-through
+invalidation. Fills and closes invalidate it so the next read goes to the
+exchange; everything else within `ttl` seconds is served from memory. While the
+balance circuit breaker is open the last value is served stale instead of failing.
+"""
+import time, threading
+
+class TTLCache:
+    def __init__(self, ttl=30.0, clock=time.monotonic):
+        self.ttl=ttl; self.clock=clock
+        self.value=None; self.at=None
+        self.hits=self.misses=self.stale_served=self.invalidations=0
+        self.lock=threading.Lock()
+
+    def fresh(self):
+        return self.at is not None and self.clock() - self.at < self.ttl
+
+    def lookup(self):
+        """(True, value) if fresh (a hit), else (False, None) (a miss); one atomic check."""
+        with self.lock:
+            if self.at is not None and self.clock() - self.at < self.ttl:
+                self.hits += 1; return True, self.value
+            self.misses += 1; return False, None
+
+    def put(self, value):
+        with self.lock:
+            self.value=value; self.at=self.clock()
+        return value
+
+    def stale(self):
+        with self.lock:
+            self.stale_served += 1; return self.value
+
+    def invalidate(self):
+        with self.lock:
+            self.at=None; self.invalidations += 1
+
+    def stats(self):
+        age = None if self.at is None else round(self.clock() - self.at, 3)
+        return dict(ttl=self.ttl, age=age, hits=self.hits, misses=self.misses,
+                    stale_served=self.stale_served, invalidations=self.invalidations)
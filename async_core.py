@@ -0,0 +1,118 @@
+"""
+async_core.py
+-------------
+Asyncio execution core for exchange I/O.
+
+One event loop runs in a background thread and owns one `ccxt.async_support`
+exchange (one aiohttp session, one connection pool). The trading thread submits
+coroutines with `run()` and independent requests of a tick (balance + OHLCV) go
+out together through `asyncio.gather`, so a tick costs about the slowest call
+instead of the sum of all of them.
+
+A user `bot_core` keeps working AS-IS: its sync functions are run in the loop's
+default thread-pool executor, so they still overlap with each other.
+
+The loop thread starts with the first `run()`: a web-only process never starts it.
+Coroutines and executor calls run in a copy of the submitting thread's context.
+"""
+import asyncio, functools, threading, contextvars
+
+class AsyncCore:
+    def __init__(self, config, core=None):
+        self.config=config; self.core=core
+        self.loop=asyncio.new_event_loop()
+        self.exchange=None
+        self._thread=None
+        self._lock=threading.Lock()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread=threading.Thread(target=self._run, daemon=True, name="async-core")
+                self._thread.start()
+
+    def run(self, coro, timeout=None):
+        """Run a coroutine on the core loop from any other thread and wait for it."""
+        if self._thread is None: self._start()
+        return asyncio.run_coroutine_threadsafe(self._in(contextvars.copy_context(), coro), self.loop).result(timeout)
+
+    @staticmethod
+    async def _in(ctx, coro):
+        # a Task runs in a copy of the context current at its creation: create it inside the
+        # caller's, so context variables (log bindings: tick, symbol) carry over to the loop thread
+        return await ctx.run(asyncio.ensure_future, coro)
+
+    def close(self):
+        if self.exchange is not None: self.run(self.exchange.close())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+    def _ex(self):
+        # built lazily on the loop thread: aiohttp sessions bind to the running loop
+        if self.exchange is None:
+            import ccxt.async_support as ccxt_async
+            self.exchange = ccxt_async.bingx(dict(self.config))
+        return self.exchange
+
+    async def _core(self, name, *a, **k):
+        fn = functools.partial(getattr(self.core, name), *a, **k)
+        return await asyncio.get_running_loop().run_in_executor(None, contextvars.copy_context().run, fn)
+
+    def _has(self, name): return self.core is not None and hasattr(self.core, name)
+
+    async def fetch_ohlcv(self, symbol, timeframe, limit=500, since=None):
+        # user core has no `since`; a small `limit` still returns the latest bars
+        if self._has('fetch_ohlcv'): return await self._core('fetch_ohlcv', symbol, timeframe, limit)
+        return await self._ex().fetch_ohlcv(symbol, timeframe=timeframe, since=since, limit=limit)
+
+    async def fetch_balance(self):
+        if self._has('fetch_balance'): return await self._core('fetch_balance', {'type':'swap'})
+        return await self._ex().fetch_balance(params={'type':'swap'})
+
+    async def create_order(self, symbol, side, amount, price=None, reduce_only=False):
+        s = 'buy' if side=='long' else 'sell'
+        if self._has('create_order'):
+            return await self._core('create_order', symbol=symbol, type='market', side=s, amount=amount, params={'reduceOnly': reduce_only})
+        return await self._ex().create_order(symbol, type='market', side=s, amount=amount, params={'reduceOnly': reduce_only})
+
+    async def set_leverage(self, leverage, symbol):
+        if self._has('set_leverage'): return await self._core('set_leverage', leverage, symbol, params={'marginMode':'isolated'})
+        return await self._ex().set_leverage(leverage, symbol, params={'marginMode':'isolated'})
+
+    async def call(self, name, *a, **k):
+        """Any ccxt-style method by name: the user core's when it has it, else ccxt's."""
+        if self._has(name): return await self._core(name, *a, **k)
+        return await getattr(self._ex(), name)(*a, **k)
+
+    def blocking(self): return Blocking(self)
+
+    async def refresh_store(self, store, fetch=None):
+        """Async twin of CandleStore.refresh using fetch (default: self.fetch_ohlcv)."""
+        fetch = fetch or self.fetch_ohlcv
+        limit, since = store.plan()
+        n = store.apply(await fetch(store.symbol, store.timeframe, limit, since), since)
+        if n is None: n = store.apply(await fetch(store.symbol, store.timeframe, store.size, None), None)
+        return n
+
+class Blocking:
+    """
+    Sync ccxt-style facade over the core loop for code written against a blocking
+    client (strategy_guard / execution). Calls made from several threads overlap
+    on the loop.
+    """
+    _NAMES = {'create_order':'createOrder', 'create_orders':'createOrders', 'cancel_all_orders':'cancelAllOrders'}
+    def __init__(self, aio):
+        self.aio=aio; self.id='bingx'
+        if aio.core is not None:
+            self.has = {camel: hasattr(aio.core, name) for name, camel in self._NAMES.items()}
+        else:
+            async def has(): return dict(aio._ex().has)
+            self.has = aio.run(has())
+
+    def __getattr__(self, name):
+        if name not in self._NAMES: raise AttributeError(name)
+        if not self.has.get(self._NAMES[name]): raise AttributeError(name)
+        return lambda *a, **k: self.aio.run(self.aio.call(name, *a, **k))
@@ -0,0 +1,196 @@
+"""
+backtest.py
+-----------
+Replay the live strategy (main.signal + spike/explosion filters + the exit plan of
+exit_manager: TP1 partial close, break-even, ATR trailing stop, TP2) over historical candles.
+
+Indicators are computed for the whole history at once: every Wilder/EMA recursion
+is expressed as a seeded pandas `ewm(adjust=False)` (C loop, no Python per bar) and
+matches `ta` / indicators_stream. Signals are boolean array expressions. The only
+Python loop is per *trade*: a chunked NumPy scan finds the first bar whose high/low
+crosses TP1 or the stop; only after TP1, while the stop trails, is the trade walked bar
+by bar through the same `exit_manager.Plan.check` the live bot runs.
+
+Usage:
+    python backtest.py data/DOGE_15m.csv data/BTC_15m.parquet --fee 0.0005
+Files need columns timestamp,open,high,low,close[,volume]; timestamp in ms or ISO.
+"""
+import time, argparse
+import numpy as np
+import pandas as pd
+from exit_manager import Plan
+
+# Mirrors the constants hard-coded in main.signal() / main.py / strategy_guard.
+# exit_plan=0: one TP (tp1_atr) / SL for the whole position, as main.py with EXIT_MANAGER=0.
+DEFAULTS = dict(
+    adx_min=15.0, rsi_hi=70.0, rsi_lo=30.0, spike_mult=4.0, range_max=3.0, bb_max=3.5,
+    tp1_atr=1.2, tp2_atr=2.4, sl_atr=1.2, trail_atr=1.0, tp1_fraction=0.5, exit_plan=1,
+    leverage=10, risk_alloc=0.60, fee=0.0005,
+)
+
+def load_candles(path):
+    df = pd.read_parquet(path) if str(path).endswith((".parquet", ".pq")) else pd.read_csv(path)
+    df.columns = [c.lower() for c in df.columns]
+    ts = df["timestamp"]
+    if not np.issubdtype(ts.dtype, np.number):
+        ts = pd.to_datetime(ts, utc=True).astype("int64") // 1_000_000
+    df["timestamp"] = ts.astype("int64")
+    for c in ["open","high","low","close"]:
+        df[c] = pd.to_numeric(df[c], errors="coerce")
+    return df.dropna(subset=["open","high","low","close"]).sort_values("timestamp").reset_index(drop=True)
+
+# ---- Bulk indicators (same definitions as ta / indicators_stream) ----
+def _wilder(x: np.ndarray, n: int, first: int):
+    """Wilder average: mean of x[first:first+n] at first+n-1, then (prev*(n-1)+x)/n. NaN before."""
+    seeded = np.full(len(x), np.nan)
+    end = first + n - 1
+    if end >= len(x): return seeded
+    seeded[end] = x[first:end+1].mean(); seeded[end+1:] = x[end+1:]
+    return pd.Series(seeded).ewm(alpha=1.0/n, adjust=False).mean().to_numpy()
+
+def indicators(df: pd.DataFrame):
+    close = df["close"].to_numpy(float); high = df["high"].to_numpy(float); low = df["low"].to_numpy(float)
+    c = pd.Series(close)
+    out = {f"ema{n}": c.ewm(span=n, adjust=False, min_periods=n).mean().to_numpy() for n in (20, 50, 200)}
+
+    diff = np.diff(close, prepend=close[0])
+    up = pd.Series(np.where(diff > 0, diff, 0.0)).ewm(alpha=1/14, adjust=False, min_periods=14).mean().to_numpy()
+    dn = pd.Series(np.where(diff < 0, -diff, 0.0)).ewm(alpha=1/14, adjust=False, min_periods=14).mean().to_numpy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out["rsi"] = np.where(dn == 0, 100.0, 100.0 - 100.0/(1.0 + up/dn))
+    out["rsi"][np.isnan(up)] = np.nan
+
+    pc = np.r_[np.nan, close[:-1]]
+    tr = np.fmax(high - low, np.fmax(np.abs(high - pc), np.abs(low - pc)))
+    out["atr"] = np.nan_to_num(_wilder(tr, 14, 0))
+
+    ph = np.r_[np.nan, high[:-1]]; pl = np.r_[np.nan, low[:-1]]
+    du = high - ph; dd = pl - low
+    pos = np.where((du > dd) & (du > 0), du, 0.0); neg = np.where((dd > du) & (dd > 0), dd, 0.0)
+    tr_dm = np.fmax(high, pc) - np.fmin(low, pc)
+    a_tr = _wilder(tr_dm, 14, 1); a_pos = _wilder(pos, 14, 1); a_neg = _wilder(neg, 14, 1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pdi = np.where(a_tr != 0, 100*a_pos/a_tr, 0.0); ndi = np.where(a_tr != 0, 100*a_neg/a_tr, 0.0)
+        dx = np.where(pdi + ndi != 0, 100*np.abs((pdi - ndi)/(pdi + ndi)), 0.0)
+    dx[np.isnan(a_tr)] = np.nan
+    out["adx"] = np.nan_to_num(_wilder(np.nan_to_num(dx), 14, 14))
+
+    sd = c.rolling(20).std(ddof=0).to_numpy()
+    out["bb_width"] = 4.0*sd/close*100.0          # (hband - lband) / close * 100 with window_dev=2
+    out["range_pct"] = (high - low) / np.maximum(low, 1e-9) * 100.0
+    return out
+
+# ---- Signals ----
+def signals(df, ind: dict, p=None):
+    """
+    +1 long / -1 short / 0 per bar, evaluated at bar close exactly like main.signal().
+    `df` is a DataFrame or any mapping of OHLC arrays (optimizer passes shared-memory views).
+    """
+    p = {**DEFAULTS, **(p or {})}
+    o, h, l, c = (np.asarray(df[k], dtype=float) for k in ("open","high","low","close"))
+    rsi_prev = np.r_[np.nan, ind["rsi"][:-1]]     # live code reads RSI of the last closed bar
+    spike = (h - l) > p["spike_mult"]*np.maximum(np.abs(c - o), 1e-9)
+    explosion = (ind["range_pct"] > p["range_max"]) | (ind["bb_width"] > p["bb_max"])
+    ok = (ind["adx"] >= p["adx_min"]) & ~spike & ~explosion
+    uptrend = c > ind["ema200"]
+    e20 = ind["ema20"]; e50 = ind["ema50"]
+    long_ = ok & uptrend & (e20 > e50) & (rsi_prev < p["rsi_hi"])
+    short = ok & ~uptrend & (e20 < e50) & (rsi_prev > p["rsi_lo"])
+    return long_.astype(np.int8) - short.astype(np.int8)
+
+# ---- Fill simulation ----
+def _first_exit(high, low, start, side, tp, sl, chunk=32):
+    # most exits come within a few bars: scan a small window first, doubling it each miss
+    n = len(high); i = start
+    while i < n:
+        hh = high[i:i+chunk]; ll = low[i:i+chunk]
+        hit_sl = ll <= sl if side > 0 else hh >= sl
+        hit_tp = hh >= tp if side > 0 else ll <= tp
+        hit = hit_sl | hit_tp
+        if hit.any():
+            k = int(hit.argmax())
+            return i + k, (sl if hit_sl[k] else tp)   # both in one bar: assume SL (conservative)
+        i += chunk; chunk = min(chunk*2, 4096)
+    return -1, None
+
+def _plan_exit(high, low, start, side, entry, atr, p):
+    """
+    Walk one trade through exit_manager.Plan: ([(fraction of the entry qty, price), ...], exit bar),
+    bar -1 if still open at the end. Levels fill at their price. Within a bar the adverse extreme
+    is checked first (a stop and a target in one bar count as the stop), and a new high/low moves
+    the trailing stop for the next bars only.
+    """
+    plan = Plan(None, "long" if side > 0 else "short", 1.0, entry, atr, p["tp1_atr"], p["tp2_atr"],
+                p["sl_atr"], p["trail_atr"], p["tp1_fraction"])
+    fills = []; i = start; n = len(high)
+    while i < n:
+        if not plan.trailing:                         # fixed levels: jump to the first bar that crosses one
+            i, _ = _first_exit(high, low, i, side, plan.tp1, plan.stop)
+            if i < 0: break
+        for px in ((low[i], high[i]) if side > 0 else (high[i], low[i])):
+            reason = plan.check(px)
+            if reason == "tp1":
+                fills.append((plan.qty*plan.tp1_fraction, plan.tp1)); plan.hit_tp1(plan.tp1)
+                reason = plan.check(px)               # the same extreme may reach TP2 as well
+            if reason:
+                fills.append((plan.qty, plan.tp2 if reason == "tp2" else plan.stop)); return fills, i
+        i += 1
+    return fills, -1
+
+def simulate(df, ind: dict, sig: np.ndarray, p=None, initial=1000.0):
+    """
+    One position at a time: enter at the signal bar's close and exit along the live exit plan
+    (`_plan_exit`), or with exit_plan=0 at the first bar crossing TP (tp1_atr) or SL (sl_atr).
+    Size = equity·risk_alloc·leverage, fee per side on each part.
+    """
+    p = {**DEFAULTS, **(p or {})}
+    h, l, c = (np.asarray(df[k], dtype=float) for k in ("high","low","close"))
+    atr = ind["atr"]
+    idx = np.flatnonzero(sig)
+    equity = initial; trades = []; k = 0
+    while k < len(idx):
+        i = idx[k]; side = int(sig[i]); entry = c[i]
+        if atr[i] <= 0: k += 1; continue
+        if p["exit_plan"]:
+            fills, j = _plan_exit(h, l, i + 1, side, entry, atr[i], p)
+        else:
+            tp = entry + side*p["tp1_atr"]*atr[i]; sl = entry - side*p["sl_atr"]*atr[i]
+            j, px = _first_exit(h, l, i + 1, side, tp, sl); fills = [(1.0, px)]
+        if j < 0: break                                # still open at end of data
+        px = sum(q*x for q, x in fills)                # average exit price (fractions sum to 1)
+        notional = equity*p["risk_alloc"]*p["leverage"]
+        pnl = notional*side*(px - entry)/entry - 2*notional*p["fee"]
+        equity += pnl
+        trades.append((i, j, side, entry, px, pnl, equity))
+        if equity <= 0: break                          # account wiped out
+        k = np.searchsorted(idx, j, side="right")
+    return _stats(trades, initial)
+
+def _stats(trades, initial):
+    t = np.array(trades, dtype=float).reshape(-1, 7)
+    pnl = t[:, 5]; eq = np.r_[initial, t[:, 6]]
+    peak = np.maximum.accumulate(eq)
+    return dict(
+        trades=len(t), wins=int((pnl > 0).sum()), losses=int((pnl <= 0).sum()),
+        win_rate=float((pnl > 0).mean()) if len(t) else 0.0,
+        pnl=float(eq[-1] - initial), return_pct=float((eq[-1]/initial - 1)*100),
+        max_drawdown_pct=float(((peak - eq)/peak).max()*100),
+        log=t,
+    )
+
+def run(df, params=None, initial=1000.0):
+    ind = indicators(df)
+    return simulate(df, ind, signals(df, ind, params), params, initial)
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Backtest the live strategy over OHLCV files")
+    ap.add_argument("files", nargs="+")
+    ap.add_argument("--initial", type=float, default=1000.0)
+    for k, v in DEFAULTS.items(): ap.add_argument(f"--{k.replace('_','-')}", type=type(v), default=v)
+    a = ap.parse_args()
+    params = {k: getattr(a, k) for k in DEFAULTS}
+    for f in a.files:
+        t0 = time.perf_counter(); df = load_candles(f); r = run(df, params, a.initial)
+        print(f"{f}: bars={len(df)} trades={r['trades']} win_rate={r['win_rate']*100:.1f}% "
+              f"pnl={r['pnl']:.2f} ({r['return_pct']:.2f}%) maxDD={r['max_drawdown_pct']:.2f}% "
+              f"[{time.perf_counter()-t0:.2f}s]")
@@ -0,0 +1,306 @@
+"""
+benchmarks.py
+-------------
+Hot-path benchmarks, stored as JSON so a change can be compared against an
+earlier commit.
+
+    python benchmarks.py --out bench/$(git rev-parse --short HEAD).json
+    python benchmarks.py --compare bench/abc1234.json      # exit 1 on regression
+    python benchmarks.py --only indicators --candles data/DOGE_15m.csv
+
+Suites:
+  tick        main.tick() end to end against fake_exchange (no network), one new bar per tick
+  indicators  streaming engine (cold warm-up and one-bar update), bulk backtest.indicators
+              and the `ta` reference, at 500 / 5k / 50k rows
+  klines      candle window refresh, zero-copy views, and the DataFrame build get_klines used to do
+  dashboard   /metrics, /metrics/json requests/sec with concurrent clients (plus 304 path)
+  breakers    not timed: each production circuit breaker driven at its real call rate (simulated clock);
+              exits 1 unless healthy calls keep it closed and calls over its latency budget trip it
+  feed        not timed: ws_feed.MarketFeed over a QueueTransport: subscriptions, gzip kline and trade
+              decoding, Ping/Pong, stale -> healthy() False (REST fallback), reconnect; exits 1 on failure
+  parity      not timed: streaming indicators vs `ta` on the last 650 bars (bar by bar, sliding 500-bar
+              sync windows, a forming bar revised several times); exits 1 if any relative error > 1e-9
+
+Candles come from --candles (backtest.load_candles format), else a seeded random walk,
+so runs are comparable. Every candle-driven suite, parity included, honours --candles; a
+recorded fixture can be exported from the live journal:
+
+    python -c "from journal import Journal; Journal('journal').candles_frame('DOGE/USDT:USDT', '15m').to_csv('data/DOGE_15m.csv', index=False)"
+ Times are milliseconds; lower is better except `rps`.
+"""
+import os, sys, json, time, argparse, platform, subprocess, statistics, threading
+import numpy as np
+import pandas as pd
+
+SIZES = (500, 5_000, 50_000)
+
+def _commit():
+    try: return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception: return None
+
+def bench(fn, repeat=20, setup=None, min_time=0.0):
+    """Run fn `repeat` times (at least min_time seconds); ms stats of the calls."""
+    times = []; t_end = time.perf_counter() + min_time
+    while len(times) < repeat or time.perf_counter() < t_end:
+        arg = setup() if setup else None
+        t0 = time.perf_counter(); fn(arg) if setup else fn(); times.append((time.perf_counter() - t0)*1000)
+    times.sort()
+    return dict(n=len(times), min_ms=round(times[0], 4), median_ms=round(statistics.median(times), 4),
+                p95_ms=round(times[int(0.95*(len(times)-1))], 4))
+
+def candle_rows(n, path=None):
+    if path:
+        from backtest import load_candles
+        df = load_candles(path).tail(n)
+        a = df[["timestamp","open","high","low","close"]].to_numpy(float)
+        vol = df["volume"].to_numpy(float) if "volume" in df else np.zeros(len(df))
+        return [[int(r[0]), *map(float, r[1:]), float(v)] for r, v in zip(a, vol)]
+    from fake_exchange import random_walk
+    ohlcv = random_walk(n, seed=7)
+    t0 = 1_600_000_000_000
+    return [[t0 + i*900_000] + [float(x) for x in r] for i, r in enumerate(ohlcv)]
+
+def frame(rows):
+    return pd.DataFrame(rows, columns=["timestamp","open","high","low","close","volume"])
+
+# ---- suites ----
+def suite_indicators(a):
+    from indicators_stream import StreamingIndicators
+    import backtest
+    out = {}
+    for n in SIZES:
+        rows = candle_rows(n, a.candles); df = frame(rows)
+        ts = df["timestamp"].to_numpy(np.int64); px = df[["open","high","low","close","volume"]].to_numpy(float)
+        rep = 3 if n >= 50_000 else 10
+        out[f"indicators.stream_warm.{n}"] = bench(lambda: StreamingIndicators().sync(ts, px), rep)
+        eng = StreamingIndicators(); eng.sync(ts[:-1], px[:-1]); last = rows[-1]
+        out[f"indicators.stream_update.{n}"] = bench(lambda: eng.update(last), 200)
+        out[f"indicators.bulk.{n}"] = bench(lambda: backtest.indicators(df), rep)
+        try:
+            import ta
+        except ImportError:
+            continue
+        def ref():
+            c, h, l = df["close"], df["high"], df["low"]
+            ta.trend.EMAIndicator(close=c, window=200).ema_indicator()
+            ta.momentum.RSIIndicator(close=c, window=14).rsi()
+            ta.trend.ADXIndicator(high=h, low=l, close=c, window=14).adx()
+            ta.volatility.AverageTrueRange(high=h, low=l, close=c, window=14).average_true_range()
+            ta.volatility.BollingerBands(close=c, window=20, window_dev=2).bollinger_hband()
+        out[f"indicators.ta.{n}"] = bench(ref, rep)
+    return out
+
+def suite_klines(a):
+    from candle_store import CandleStore
+    out = {}
+    rows = candle_rows(600, a.candles)
+    store = CandleStore("BENCH/USDT:USDT", "15m", 500)
+    store.apply(rows[:500], None)
+    i = [500]
+    def step():
+        store.apply(rows[i[0]:i[0]+1], rows[i[0]][0]); i[0] = 500 + (i[0] - 499) % 100
+    out["klines.store_apply_1"] = bench(step, 500)
+    out["klines.store_full_500"] = bench(lambda: CandleStore("B", "15m", 500).apply(rows[:500], None), 100)
+    out["klines.frame_500"] = bench(store.frame, 100)
+    out["klines.views_500"] = bench(lambda: (store.ts, store.ohlcv, store.col("close")), 500)
+    return out
+
+def _main(a):
+    os.environ.update(BOT_CORE_MODULE="fake_exchange", SYMBOLS="BENCH/USDT:USDT", MAX_OPEN_POSITIONS="0",
+                      JOURNAL_DIR="", SNAPSHOT_PATH="", MARKET_FEED="rest",
+                      RATE_LIMIT_RPS="1000000")   # measure the code path, not the exchange budget
+    os.environ.setdefault("BINGX_API_KEY", "bench"); os.environ.setdefault("BINGX_API_SECRET", "bench")
+    import main
+    return main
+
+def suite_tick(a):
+    main = _main(a)
+    import fake_exchange
+    from symbol_state import SymbolState
+    clock = [time.time()]
+    fake_exchange.EX = fake_exchange.FakeExchange(bars_per_sec=1.0, clock=lambda: clock[0])
+    st = main.STATES[0]                             # the configured BENCH symbol
+    main.tick(st)                                   # cold: full fetch + warm-up
+    def one():
+        clock[0] += 1.0; main.tick(st)              # one new bar per tick
+    out = {"tick.new_bar": bench(one, 200)}
+    out["tick.same_bar"] = bench(lambda: main.tick(st), 200)
+    def cold():                                     # a fresh state in the configured slot
+        main.STATES[0] = main.BY_SYMBOL[st.symbol] = SymbolState(st.symbol, main.INTERVAL, 500); main.tick(main.STATES[0])
+    out["tick.cold"] = bench(cold, 10)
+    main.STATES[0] = main.BY_SYMBOL[st.symbol] = st
+    return out
+
+def suite_dashboard(a):
+    main = _main(a)
+    import http.client
+    from werkzeug.serving import make_server
+    srv = make_server("127.0.0.1", 0, main.app, threaded=True)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    port = srv.server_port; out = {}
+    def load(path, etag=False):
+        tag = None
+        if etag:
+            c = http.client.HTTPConnection("127.0.0.1", port); c.request("GET", path)
+            r = c.getresponse(); r.read(); tag = r.getheader("ETag"); c.close()
+        done = [0]; lat = []; lock = threading.Lock(); stop = time.perf_counter() + a.seconds
+        def client():
+            n = 0; mine = []
+            while time.perf_counter() < stop:
+                t0 = time.perf_counter()
+                c = http.client.HTTPConnection("127.0.0.1", port)
+                c.request("GET", path, headers={"If-None-Match": tag} if tag else {})
+                c.getresponse().read(); c.close()
+                mine.append((time.perf_counter() - t0)*1000); n += 1
+            with lock: done[0] += n; lat.extend(mine)
+        ts = [threading.Thread(target=client) for _ in range(a.clients)]
+        t0 = time.perf_counter()
+        for t in ts: t.start()
+        for t in ts: t.join()
+        lat.sort()
+        return dict(clients=a.clients, requests=done[0], rps=round(done[0]/(time.perf_counter()-t0), 1),
+                    median_ms=round(statistics.median(lat), 3), p95_ms=round(lat[int(0.95*(len(lat)-1))], 3))
+    out["dashboard.metrics_html"] = load("/metrics")
+    out["dashboard.metrics_json"] = load("/metrics/json")
+    out["dashboard.metrics_304"] = load("/metrics", etag=True)
+    srv.shutdown()
+    return out
+
+def suite_breakers(a):
+    main = _main(a)
+    from resilience import CircuitBreaker
+    from symbol_state import SymbolState
+    now = [0.0]
+    def fresh(cb):   # same configuration as the live breaker, on the simulated clock
+        return CircuitBreaker(cb.max_failures, cb.reset_after, cb.name, cb.window, cb.min_calls,
+                              cb.failure_rate, cb.latency_budget, clock=lambda: now[0])
+    live = [(SymbolState("CHECK/USDT:USDT", main.INTERVAL).cb_ohlcv, main.SCAN_PERIOD),  # one fetch per scan
+            (main.CB_balance, main.BALANCE_TTL),                                         # one fetch per cache TTL
+            (main.CB_order, 900.0)]                                                      # ~4 orders an hour
+    bad = []
+    for cb, period in live:
+        b = fresh(cb)
+        for _ in range(int(7200/period)):                      # two healthy hours
+            now[0] += period; b.on_success(0.5*b.latency_budget)
+        if b.state != "closed": bad.append(f"{b.name}: tripped on healthy calls")
+        t0 = now[0]
+        while b.state == "closed" and now[0] - t0 < b.window:  # then every call over budget
+            now[0] += period; b.on_success(1.5*b.latency_budget)
+        if b.state == "closed": bad.append(f"{b.name}: slow calls every {period:g}s never tripped it")
+        else: print(f"[breakers] {b.name}: call every {period:g}s, tripped on latency after {now[0]-t0:g}s", file=sys.stderr)
+    if bad: sys.exit("[breakers] " + "; ".join(bad))
+    return {}
+
+def suite_feed(a):
+    import gzip, queue
+    from ws_feed import MarketFeed, QueueTransport
+    sym = "DOGE/USDT:USDT"; got = queue.Queue(); transports = []
+    def factory():
+        t = QueueTransport(); transports.append(t); return t
+    feed = MarketFeed([sym], "15m", lambda s, bars: got.put((s, bars)), factory, trades=True,
+                      stale_after=0.5, log=lambda m: None)
+    def wait(cond, timeout=5.0):
+        end = time.monotonic() + timeout
+        while not cond() and time.monotonic() < end: time.sleep(0.01)
+        return cond()
+    def frame(data_type, data):   # BingX sends gzip-compressed JSON
+        return gzip.compress(json.dumps({"dataType": data_type, "data": data}).encode())
+    bad = []; n = [0]
+    def check(ok, what):
+        n[0] += 1
+        if not ok: bad.append(what)
+    t0 = 1_700_000_100_000 - 1_700_000_100_000 % 900_000
+    feed.start()
+    check(wait(lambda: feed.connected), "never connected")
+    t = transports[0]
+    check(sorted(json.loads(x)["dataType"] for x in t.sent) == ["DOGE-USDT@kline_15m", "DOGE-USDT@trade"], f"subscriptions: {t.sent}")
+    t.inbox.put(frame("DOGE-USDT@kline_15m", [{"T": t0, "o": "0.1", "h": "0.12", "l": "0.09", "c": "0.11", "v": "5"}]))
+    s, bars = got.get(timeout=2)
+    check((s, bars) == (sym, [[t0, 0.1, 0.12, 0.09, 0.11, 5.0]]), f"kline decoded as {s} {bars}")
+    t.inbox.put(frame("DOGE-USDT@trade", [{"T": t0 + 1000, "p": "0.125", "q": "2"}, {"T": t0 + 2000, "p": "0.105", "q": "1"}]))
+    s, bars = got.get(timeout=2)
+    check(bars == [[t0, 0.1, 0.125, 0.09, 0.105, 8.0]], f"trades folded into {bars}")
+    check(feed.healthy(sym), "not healthy right after data")
+    t.inbox.put("Ping"); t.inbox.put(json.dumps({"ping": "p1", "time": "x"}))
+    check(wait(lambda: "Pong" in t.sent and any('"pong": "p1"' in x for x in t.sent)), f"no pong: {t.sent[-2:]}")
+    check(wait(lambda: not feed.healthy(sym), 2.0), "still healthy after stale_after without data (no REST fallback)")
+    t.inbox.put(ConnectionError("dropped"))
+    check(wait(lambda: len(transports) == 2 and feed.connected, 5.0), "did not reconnect")
+    check(feed.reconnects == 1 and t.closed, f"reconnects={feed.reconnects} closed={t.closed}")
+    check(len(transports) == 2 and len(transports[1].sent) == 2, "did not resubscribe after reconnect")
+    feed.stop()
+    print(f"[feed] {n[0] - len(bad)}/{n[0]} checks passed", file=sys.stderr)
+    if bad: sys.exit("[feed] " + "; ".join(bad))
+    return {}
+
+PARITY_TOLERANCE = 1e-9
+
+def suite_parity(a):
+    from indicators_stream import StreamingIndicators, parity_check
+    rows = candle_rows(650, a.candles); df = frame(rows)
+    ts = df["timestamp"].to_numpy(np.int64); px = df[["open","high","low","close","volume"]].to_numpy(float)
+    cases = dict(bar_by_bar=parity_check(df))
+    # the live path: sync() over a 500-bar window that slides one bar per tick
+    eng = StreamingIndicators(); eng.sync(ts[:500], px[:500])
+    for end in range(501, len(ts) + 1): eng.sync(ts[end - 500:end], px[end - 500:end])
+    cases["sliding_sync"] = parity_check(df, eng)
+    # the last bar forming: revised several times before its final values
+    eng = StreamingIndicators(); eng.sync(ts[:-1], px[:-1])
+    t, o, h, l, c, v = rows[-1]
+    for k in (0.2, 0.9, 0.5):
+        mid = o + (c - o)*k
+        eng.update([t, o, max(o, mid), min(o, mid), mid, v*k])
+    eng.update(rows[-1])
+    cases["revised_forming"] = parity_check(df, eng)
+    bad = {f"{case}.{k}": e for case, errs in cases.items() for k, e in errs.items() if not e <= PARITY_TOLERANCE}
+    worst = max(e for errs in cases.values() for e in errs.values())
+    print(f"[parity] {len(cases)} cases, worst relative error {worst:.2e}", file=sys.stderr)
+    if bad: sys.exit(f"[parity] streaming indicators drifted from ta (> {PARITY_TOLERANCE:g}): {bad}")
+    return {}
+
+SUITES = dict(indicators=suite_indicators, klines=suite_klines, tick=suite_tick, dashboard=suite_dashboard,
+              breakers=suite_breakers, feed=suite_feed, parity=suite_parity)
+
+# ---- compare ----
+def compare(base, new, tolerance):
+    """Print base vs new; returns names that regressed by more than `tolerance`."""
+    bad = []
+    print(f"{'benchmark':42} {'base':>11} {'new':>11} {'ratio':>7}")
+    for name, r in sorted(new["results"].items()):
+        b = base["results"].get(name)
+        if not b: print(f"{name:42} {'-':>11} {_key(r)[1]:>11.3f}"); continue
+        k, v = _key(r); bv = b.get(k)
+        if not bv: continue
+        ratio = v / bv
+        worse = ratio < 1 - tolerance if k == "rps" else ratio > 1 + tolerance
+        if worse: bad.append(name)
+        print(f"{name:42} {bv:>11.3f} {v:>11.3f} {ratio:>6.2f}x{'  <-- regression' if worse else ''}")
+    return bad
+
+def _key(r): return ("rps", r["rps"]) if "rps" in r else ("median_ms", r["median_ms"])
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Hot-path benchmarks")
+    ap.add_argument("--only", nargs="*", choices=list(SUITES), help="suites to run (default: all)")
+    ap.add_argument("--candles", help="candle fixture (csv/parquet) instead of the seeded random walk")
+    ap.add_argument("--clients", type=int, default=16, help="concurrent dashboard clients")
+    ap.add_argument("--seconds", type=float, default=3.0, help="duration of each dashboard load")
+    ap.add_argument("--out", help="write results JSON here")
+    ap.add_argument("--compare", help="baseline results JSON")
+    ap.add_argument("--tolerance", type=float, default=0.15, help="allowed slowdown before flagging")
+    a = ap.parse_args()
+    results = {}
+    for name in a.only or SUITES:
+        t0 = time.perf_counter(); results.update(SUITES[name](a))
+        print(f"[bench] {name} done in {time.perf_counter()-t0:.1f}s", file=sys.stderr)
+    doc = dict(meta=dict(commit=_commit(), python=platform.python_version(), machine=platform.machine(),
+                         numpy=np.__version__, pandas=pd.__version__, candles=a.candles or "random_walk(seed=7)",
+                         at=time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())),
+               results=results)
+    if a.out:
+        os.makedirs(os.path.dirname(a.out) or ".", exist_ok=True)
+        with open(a.out, "w") as f: json.dump(doc, f, indent=2)
+    if a.compare:
+        with open(a.compare) as f: base = json.load(f)
+        sys.exit(1 if compare(base, doc, a.tolerance) else 0)
+    if not a.out: print(json.dumps(doc, indent=2))
@@ -0,0 +1,136 @@
+"""
+candle_store.py
+---------------
+Persistent in-memory OHLCV window per (symbol, timeframe).
+
+The first refresh pulls the full window; every later refresh asks only for the
+bars since the last known timestamp (`since=`) and replaces the forming bar or
+appends new ones. A full reload happens only when the store is empty or fell
+too far behind (process slept, exchange outage) to be patched incrementally.
+Bars live in preallocated NumPy arrays that indicator/filter code reads as views.
+"""
+import time
+import numpy as np
+
+_TF_UNITS = {'m': 60, 'h': 3600, 'd': 86400, 'w': 604800, 'M': 2592000}
+
+def timeframe_ms(tf: str) -> int:
+    return int(tf[:-1]) * _TF_UNITS[tf[-1]] * 1000
+
+def _clean(ohlcv):
+    out = []
+    for r in ohlcv or []:
+        try: row = [int(r[0])] + [float(x) for x in r[1:6]]
+        except (TypeError, ValueError, IndexError): continue
+        if len(row) == 6 and all(v == v for v in row): out.append(row)
+    return out
+
+class CandleStore:
+    """
+    Fixed-capacity, array-backed window: int64 timestamps and float64 open/high/
+    low/close/volume columns, updated in place. `ts`, `ohlcv` and `col()` are
+    zero-copy views of the live window; they are valid until the next update.
+
+    Storage is twice the window: bars are appended behind the window and, when
+    the end is reached, the window is moved back to the front in one copy (every
+    `size` appends), so views are always contiguous and nothing is allocated per bar.
+    """
+    COLUMNS = ("open", "high", "low", "close", "volume")
+
+    def __init__(self, symbol, timeframe, size=500, inc_limit=5):
+        self.symbol=symbol; self.timeframe=timeframe
+        self.size=size; self.inc_limit=inc_limit
+        self.tf_ms=timeframe_ms(timeframe)
+        self._ts=np.zeros(2*size, dtype=np.int64)
+        self._px=np.zeros((2*size, 5), dtype=np.float64)
+        self.lo=self.hi=0       # live window is [lo, hi)
+        self.full_fetches=0; self.inc_fetches=0
+
+    def __len__(self): return self.hi - self.lo
+
+    @property
+    def ts(self): return self._ts[self.lo:self.hi]
+
+    @property
+    def ohlcv(self): return self._px[self.lo:self.hi]
+
+    def col(self, name): return self._px[self.lo:self.hi, self.COLUMNS.index(name)]
+
+    @property
+    def rows(self):
+        """[[ts, o, h, l, c, v], ...] copy of the window (journal/snapshot/debug, not the hot path)."""
+        return [[t] + p for t, p in zip(self.ts.tolist(), self.ohlcv.tolist())]
+
+    def last_ts(self): return int(self._ts[self.hi-1]) if self.hi > self.lo else None
+
+    def load(self, ts, ohlcv):
+        """Replace the window with arrays (ascending ts); keeps the newest `size` bars."""
+        n = min(len(ts), self.size)
+        self._ts[:n] = ts[len(ts)-n:]; self._px[:n] = ohlcv[len(ts)-n:]
+        self.lo, self.hi = 0, n
+
+    def load_rows(self, rows):
+        rows = rows[-self.size:]
+        if not rows: self.lo = self.hi = 0; return
+        a = np.asarray(rows, dtype=np.float64)    # ms timestamps are exact in float64
+        self.load(a[:, 0].astype(np.int64), a[:, 1:6])
+
+    def _push(self, r):
+        if self.hi == len(self._ts):
+            n = self.hi - self.lo
+            self._ts[:n] = self._ts[self.lo:self.hi]; self._px[:n] = self._px[self.lo:self.hi]
+            self.lo, self.hi = 0, n
+        self._ts[self.hi] = r[0]; self._px[self.hi] = r[1:6]; self.hi += 1
+        if self.hi - self.lo > self.size: self.lo += 1
+
+    def _behind(self, now_ms):
+        return now_ms - self.last_ts() > (self.inc_limit - 1) * self.tf_ms
+
+    def plan(self, now_ms=None):
+        """(limit, since) for the next fetch; since=None means a full reload."""
+        now_ms = int(time.time()*1000) if now_ms is None else now_ms
+        if not len(self) or self._behind(now_ms): return self.size, None
+        return self.inc_limit, self.last_ts()
+
+    def apply(self, ohlcv, since):
+        """Fold a fetch made from plan(); None when it left a gap (caller reloads)."""
+        data = _clean(ohlcv)
+        if since is None:
+            self.load_rows(data); self.full_fetches += 1
+            return len(self)
+        self.inc_fetches += 1
+        if data and data[0][0] > self.last_ts() + self.tf_ms:
+            return None   # gap: incremental window did not reach our last bar
+        return self.merge(data)
+
+    def refresh(self, fetch, now_ms=None):
+        """
+        fetch(symbol, timeframe, limit, since) -> raw ohlcv list.
+        Returns the number of bars replaced or appended.
+        """
+        limit, since = self.plan(now_ms)
+        n = self.apply(fetch(self.symbol, self.timeframe, limit, since), since)
+        if n is None: n = self.apply(fetch(self.symbol, self.timeframe, self.size, None), None)
+        return n
+
+    def merge(self, data):
+        changed = 0
+        for r in data:
+            ts = r[0]
+            if self.hi == self.lo or ts > self._ts[self.hi-1]:
+                self._push(r); changed += 1
+                continue
+            # replace the forming bar (or a late revision of a recent one)
+            for i in range(self.hi-1, max(self.hi-1-self.inc_limit, self.lo-1), -1):
+                if self._ts[i] == ts:
+                    px = self._px[i]
+                    if px[0] != r[1] or px[1] != r[2] or px[2] != r[3] or px[3] != r[4] or px[4] != r[5]:
+                        px[:] = r[1:6]; changed += 1
+                    break
+        return changed
+
+    def frame(self):
+        import pandas as pd
+        df = pd.DataFrame(self.ohlcv, columns=list(self.COLUMNS))
+        df.insert(0, "timestamp", pd.to_datetime(self.ts, unit="ms"))
+        return df
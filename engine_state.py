@@ -0,0 +1,69 @@
+"""
+engine_state.py
+---------------
+Account counters and the displayed market/position values, shared between the
+trading loop (writer) and the dashboard, metrics logger and Flask threads
+(readers), published copy-on-write:
+
+    SHARED = EngineState()
+    with SHARED.edit() as s:          # private copy of the current state ...
+        s.total_trades += 1
+        s.position_open = True; s.entry_price = price
+                                      # ... swapped in as one new version on exit
+    v = SHARED.view()                 # readers: no lock, one consistent version
+    v.position_open, v.entry_price, v.version
+
+A published `State` is never written again, and swapping the reference is one
+atomic store, so a reader holding a view cannot see `position_open=True` with
+`entry_price=0`. Writers serialize on a lock that readers never take. If the
+`with` body raises, nothing is published.
+"""
+import time, threading
+from contextlib import contextmanager
+from symbol_state import MIRRORED
+
+ACCOUNT = ("total_trades","successful_trades","failed_trades","compound_profit","cached_balance",
+           "daily_trade_count","current_day","cooldown_until","cooldown_reason","anti_reentry_until")
+FIELDS = ACCOUNT + MIRRORED + ("symbol", "symbols")   # symbol: which SymbolState the mirrored values come from
+                                                      # symbols: one summary dict per SymbolState
+
+_DEFAULTS = dict(total_trades=0, successful_trades=0, failed_trades=0, compound_profit=0.0, cached_balance=None,
+                 daily_trade_count=0, current_day=None, cooldown_until=0.0, cooldown_reason="", anti_reentry_until=0.0,
+                 current_price=0.0, update_time="", rsi_value=0.0, adx_value=0.0, ema_200_value=0.0, current_atr=0.0,
+                 price_range_value=None, bb_width=None, supertrend_dir_value=None, ema20_value=None, ema50_value=None,
+                 position_open=False, position_side="N/A", entry_price=0.0, tp1_price=0.0, tp2_price=0.0, sl_price=0.0,
+                 current_pnl=0.0, trailing_active=False, symbol=None, symbols=())
+
+class State:
+    __slots__ = FIELDS + ("version", "published_at")
+    def __init__(self):
+        for k in FIELDS: setattr(self, k, _DEFAULTS[k])
+        self.version=0; self.published_at=0.0
+
+    def copy(self):
+        s = State.__new__(State)
+        for k in State.__slots__: setattr(s, k, getattr(self, k))
+        return s
+
+    def as_dict(self): return {k: getattr(self, k) for k in State.__slots__}
+
+class EngineState:
+    def __init__(self):
+        self._view=State()
+        self._lock=threading.Lock()
+
+    def view(self):
+        """The current published State; treat it as read-only."""
+        return self._view
+
+    @contextmanager
+    def edit(self):
+        with self._lock:
+            s = self._view.copy()
+            yield s
+            s.version = self._view.version + 1; s.published_at = time.time()
+            self._view = s
+
+    def publish(self, **values):
+        with self.edit() as s:
+            for k, v in values.items(): setattr(s, k, v)
@@ -0,0 +1,126 @@
+"""
+execution.py
+------------
+Order execution pipeline behind `strategy_guard.enter_trade_protected`.
+
+    ex = Executor(exchange_or_core)
+    r = ex.enter_protected(symbol, "long", qty, tp=tp1, sl=sl)
+    r.ok, r.info, r.timings    # timings: {"protect": s, "entry": s, "total": s}
+    r.order                    # the entry's order response (fill price, qty, fee), if any
+
+Phases:
+  protect  TP and SL go out together: one `create_orders` batch request when the
+           client supports it and both order shapes are already known, otherwise
+           two parallel requests that each walk the candidate shapes.
+  entry    the market entry, only once both protections were accepted.
+  cancel   cleanup when a protection or the entry failed.
+
+The shape (order type + params) BingX accepted is cached per exchange, symbol and
+order kind, so only the first trade of a symbol pays for rejected shapes. Phase
+durations are also recorded as stage_seconds{stage="execution_<phase>"}.
+"""
+import time, threading
+from concurrent.futures import ThreadPoolExecutor
+from instrument import observe, inc
+from strategy_guard import _build_protective_specs, _entry_side, _cancel_safely
+
+def client_id(client):
+    return getattr(client, "id", None) or getattr(client, "__name__", None) or type(client).__name__
+
+def supports(client, name, camel):
+    has = getattr(client, "has", None)
+    if isinstance(has, dict) and camel in has: return bool(has[camel])
+    return callable(getattr(client, name, None) or getattr(client, camel, None))
+
+class Result:
+    __slots__ = ("ok", "info", "timings", "batched", "order")
+    def __init__(self, ok, info, timings, batched=False, order=None):
+        self.ok=ok; self.info=info; self.timings=timings; self.batched=batched; self.order=order
+    def __iter__(self): return iter((self.ok, self.info))   # ok, info = result
+
+class ShapeCache:
+    """(exchange, symbol, kind) -> index of the spec the exchange last accepted."""
+    def __init__(self):
+        self.shapes={}; self.lock=threading.Lock()
+    def order(self, key, n):
+        i = self.shapes.get(key)
+        return list(range(n)) if i is None else [i] + [j for j in range(n) if j != i]
+    def known(self, key): return key in self.shapes
+    def learn(self, key, i):
+        with self.lock: self.shapes[key] = i
+    def forget(self, key):
+        with self.lock: self.shapes.pop(key, None)
+
+SHAPES = ShapeCache()
+_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="execution")
+
+class Executor:
+    def __init__(self, client, shapes=SHAPES, pool=_POOL):
+        self.client=client; self.shapes=shapes; self.pool=pool
+        self.id=client_id(client)
+
+    def _place(self, symbol, kind, specs, qty):
+        """Walk `specs` starting from the cached shape. Returns (ok, error)."""
+        key = (self.id, symbol, kind); last_err = ""
+        for i in self.shapes.order(key, len(specs)):
+            s = specs[i]
+            try:
+                self.client.create_order(symbol, s['type'], s['side'], qty, params=s['params'])
+                self.shapes.learn(key, i); return True, ""
+            except Exception as e:
+                last_err = f"{type(e).__name__}: {e}"
+                inc("order_shape_rejected_total", kind=kind, type=s['type'])
+        self.shapes.forget(key)
+        return False, last_err
+
+    def _batch(self, symbol, tp_specs, sl_specs, qty):
+        """One create_orders request with both cached shapes. None = not attempted/failed."""
+        keys = [(self.id, symbol, "tp"), (self.id, symbol, "sl")]
+        if not all(self.shapes.known(k) for k in keys) or not supports(self.client, "create_orders", "createOrders"):
+            return None
+        orders = [dict(symbol=symbol, type=s['type'], side=s['side'], amount=qty, params=s['params'])
+                  for s in (tp_specs[self.shapes.shapes[keys[0]]], sl_specs[self.shapes.shapes[keys[1]]])]
+        try:
+            res = self.client.create_orders(orders)
+        except Exception:
+            inc("order_batch_failed_total"); return None
+        if not isinstance(res, list) or len(res) != 2 or any((o or {}).get("status") == "rejected" for o in res):
+            inc("order_batch_failed_total"); self.cancel_all(symbol); return None
+        return True
+
+    def cancel_all(self, symbol): _cancel_safely(self.client, symbol)
+
+    def enter_protected(self, symbol, side, qty, tp, sl):
+        """TP + SL, then the entry. Returns a Result (unpacks as ok, info)."""
+        t0 = time.perf_counter(); timings = {}
+        tp_specs, sl_specs = _build_protective_specs(side, tp, sl)
+        def phase(name, t):
+            timings[name] = dt = time.perf_counter() - t
+            observe("stage_seconds", dt, stage=f"execution_{name}")
+            return time.perf_counter()
+        def done(ok, info, batched=False, order=None):
+            phase("total", t0); return Result(ok, info, timings, batched, order)
+
+        # (1) protections: batch when possible, else TP and SL in parallel
+        t = time.perf_counter()
+        batched = bool(self._batch(symbol, tp_specs, sl_specs, qty))
+        if not batched:
+            f_tp = self.pool.submit(self._place, symbol, "tp", tp_specs, qty)
+            f_sl = self.pool.submit(self._place, symbol, "sl", sl_specs, qty)
+            (ok_tp, err_tp), (ok_sl, err_sl) = f_tp.result(), f_sl.result()
+            if not (ok_tp and ok_sl):
+                t = phase("protect", t)
+                if ok_tp or ok_sl:
+                    self.cancel_all(symbol); phase("cancel", t)
+                return done(False, f"TP rejected by exchange ({err_tp})" if not ok_tp else f"SL rejected by exchange ({err_sl})")
+        t = phase("protect", t)
+
+        # (2) entry
+        try:
+            order = self.client.create_order(symbol, 'market', _entry_side(side), qty, params={'reduceOnly': False})
+        except Exception as e:
+            t = phase("entry", t)
+            self.cancel_all(symbol); phase("cancel", t)
+            return done(False, f"entry failed after protections ({type(e).__name__}: {e})", batched)
+        phase("entry", t)
+        return done(True, f"{side} with TP={tp:.6f} & SL={sl:.6f} confirmed", batched, order)
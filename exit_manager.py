@@ -0,0 +1,146 @@
+"""
+exit_manager.py
+---------------
+TP1 / TP2 / stop / ATR trailing exits, evaluated locally on every price the
+bot sees; the exchange is only called when a level is crossed.
+
+    EXITS = ExitManager(execute, price_of)    # execute(plan, reason, qty, price) -> bool
+    EXITS.track(symbol, "long", qty, entry, atr)
+    EXITS.on_price(symbol, price)             # websocket bar / REST tick: a few float compares
+    EXITS.start()                             # worker: runs exits, sweeps every `period` s
+
+Per position: the stop starts at entry -/+ sl_atr*ATR. At TP1 (tp1_atr*ATR)
+`tp1_fraction` of the position is closed, the stop moves to break-even and
+trailing starts: the stop follows the best price at trail_atr*ATR and never
+moves back. At TP2, or when the stop is crossed, the rest is closed.
+
+`on_price` only compares against two precomputed bounds (the nearest level
+below and above the price); a crossing marks the plan busy and queues it, and
+the worker thread does the order, so a feed callback never waits on the
+exchange. The worker also re-checks every plan against `price_of(symbol)`
+every `period` seconds, so a missed push costs at most one period. An exit
+that fails (execute returns False) is retried on the next crossing price.
+The check and the busy mark happen under one lock, so a plan is queued once
+per crossing; the worker drops an item whose reason no longer holds.
+"""
+import time, queue, threading
+import instrument
+
+class Plan:
+    __slots__ = ("symbol", "side", "qty", "entry", "atr", "tp1", "tp2", "stop", "trail",
+                 "tp1_fraction", "tp1_done", "trailing", "best", "lo", "hi", "busy")
+    def __init__(self, symbol, side, qty, entry, atr, tp1_atr, tp2_atr, sl_atr, trail_atr, tp1_fraction):
+        k = 1.0 if side == "long" else -1.0
+        self.symbol=symbol; self.side=side; self.qty=qty; self.entry=entry; self.atr=atr
+        self.tp1=entry + k*tp1_atr*atr; self.tp2=entry + k*tp2_atr*atr
+        self.stop=entry - k*sl_atr*atr; self.trail=trail_atr*atr
+        self.tp1_fraction=tp1_fraction; self.tp1_done=False; self.trailing=False
+        self.best=entry; self.busy=False
+        self.bounds()
+
+    @property
+    def long(self): return self.side == "long"
+
+    def bounds(self):
+        """lo/hi: the price range in which nothing can trigger."""
+        target = self.tp2 if self.tp1_done else self.tp1
+        self.lo, self.hi = (self.stop, target) if self.long else (target, self.stop)
+
+    def check(self, price):
+        """The crossed level ('tp1' / 'tp2' / 'stop') or None; moves the trailing stop."""
+        if self.trailing and (price > self.best if self.long else price < self.best):
+            self.best = price
+            stop = price - self.trail if self.long else price + self.trail
+            if (stop > self.stop) if self.long else (stop < self.stop):
+                self.stop = stop; self.bounds()
+        if self.lo < price < self.hi: return None
+        if (price <= self.stop) if self.long else (price >= self.stop): return "stop"
+        return "tp2" if self.tp1_done else "tp1"
+
+    def hit_tp1(self, price):
+        self.tp1_done = True; self.trailing = True; self.best = price
+        self.qty -= self.qty*self.tp1_fraction
+        be = self.entry                               # break-even, unless trailing is already past it
+        trail = price - self.trail if self.long else price + self.trail
+        self.stop = max(be, trail) if self.long else min(be, trail)
+        self.bounds()
+
+class ExitManager:
+    def __init__(self, execute, price_of=None, tp1_atr=1.2, tp2_atr=2.4, sl_atr=1.2, trail_atr=1.0,
+                 tp1_fraction=0.5, period=0.25, log=print):
+        self.execute=execute; self.price_of=price_of
+        self.params=dict(tp1_atr=tp1_atr, tp2_atr=tp2_atr, sl_atr=sl_atr, trail_atr=trail_atr, tp1_fraction=tp1_fraction)
+        self.period=period; self.log=log
+        self.plans={}
+        self.lock=threading.Lock()     # check-and-mark-busy: feed callbacks and the sweep race on a plan
+        self.q=queue.Queue()
+        self._thread=None
+        self.stats_={"checks": 0, "exits": 0, "failed": 0}
+
+    def track(self, symbol, side, qty, entry, atr):
+        plan = self.plans[symbol] = Plan(symbol, side, qty, entry, atr, **self.params)
+        return plan
+
+    def untrack(self, symbol): self.plans.pop(symbol, None)
+
+    def plan(self, symbol): return self.plans.get(symbol)
+
+    def on_price(self, symbol, price):
+        p = self.plans.get(symbol)
+        if p is None or p.busy or not price: return None
+        with self.lock:
+            if p.busy: return None
+            self.stats_["checks"] += 1
+            reason = p.check(price)
+            if reason: p.busy = True
+        if reason: self.q.put((p, reason, price))
+        return reason
+
+    # ---- worker ----
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True, name="exit-manager")
+            self._thread.start()
+        return self
+
+    def _run(self):
+        while True:
+            try: p, reason, price = self.q.get(timeout=self.period)
+            except queue.Empty:
+                self.sweep(); continue
+            try: self._exit(p, reason, price)
+            except Exception as e: self.log(f"[exit] {p.symbol} {reason} error: {e}")
+            finally: p.busy = False
+
+    def _exit(self, p, reason, price):
+        if self.plans.get(p.symbol) is not p: return        # closed meanwhile (reconcile, TP/SL on the exchange)
+        with self.lock:                                     # stale: the plan moved on since this was queued
+            if (reason == "tp1" and p.tp1_done) or p.check(price) != reason: return
+        qty = p.qty*p.tp1_fraction if reason == "tp1" else p.qty
+        t0 = time.perf_counter()
+        ok = self.execute(p, reason, qty, price)
+        instrument.observe("stage_seconds", time.perf_counter() - t0, stage="exit_order")
+        instrument.inc("exits_total", reason=reason, ok=str(bool(ok)).lower())
+        if not ok:
+            self.stats_["failed"] += 1; return
+        self.stats_["exits"] += 1
+        if reason == "tp1": p.hit_tp1(price)
+        else: self.untrack(p.symbol)
+
+    def sweep(self):
+        if self.price_of is None: return
+        for sym in list(self.plans):
+            self.on_price(sym, self.price_of(sym))
+
+    def stats(self):
+        return dict(self.stats_, open={s: dict(side=p.side, qty=p.qty, stop=p.stop, tp1=p.tp1, tp2=p.tp2,
+                                               tp1_done=p.tp1_done, trailing=p.trailing) for s, p in list(self.plans.items())})
+
+    # warm start
+    def state(self): return {s: {k: getattr(p, k) for k in Plan.__slots__ if k != "busy"} for s, p in self.plans.items()}
+
+    def restore(self, d):
+        for sym, v in d.items():
+            p = Plan.__new__(Plan)
+            for k, x in v.items(): setattr(p, k, x)
+            p.busy = False; self.plans[sym] = p
@@ -0,0 +1,342 @@
+"""
+fake_exchange.py
+----------------
+Offline BingX perpetual simulator for load and failure testing, no API keys.
+
+It implements the ccxt calls the bot uses (fetch_ohlcv, fetch_balance, fetch_positions,
+fetch_my_trades, create_order, create_orders, set_leverage, cancel_all_orders) over replayed
+candles, with configurable latency, error injection and a request rate limit.
+Errors are real ccxt exceptions, so CircuitBreaker / retry see what they would
+see live. The module itself has the `bot_core` function signatures, so the whole
+bot runs against it unchanged:
+
+    BOT_CORE_MODULE=fake_exchange FAKE_LATENCY_MS=80 FAKE_ERROR_RATE=0.05 python main.py
+
+    FAKE_CANDLES   CSV/parquet to replay (backtest.load_candles format); default: seeded random walk
+    FAKE_BARS_PER_SEC  replay speed; 0 = real time (one bar per timeframe)
+    FAKE_LATENCY_MS / FAKE_JITTER_MS / FAKE_ERROR_RATE / FAKE_RPS / FAKE_BALANCE / FAKE_SEED
+
+`WSServer` pushes the same bars as BingX-format gzip kline frames on a localhost
+websocket (MARKET_FEED=ws FEED_URL=ws://127.0.0.1:<port>/swap-market), and
+`python fake_exchange.py loadtest --symbols 20 --seconds 60` drives main.py
+against the simulator and prints tick latency, retries, breaker trips and orders.
+"""
+import os, sys, time, json, gzip, random, threading, argparse
+import numpy as np
+import ccxt
+from candle_store import timeframe_ms
+
+def random_walk(n=5000, seed=1, start=0.1):
+    r = np.random.default_rng(seed)
+    c = start*np.exp(np.cumsum(r.normal(0, 0.004, n))); o = np.r_[c[0], c[:-1]]
+    h = np.maximum(o, c)*(1 + r.uniform(0, 0.003, n)); l = np.minimum(o, c)*(1 - r.uniform(0, 0.003, n))
+    return np.column_stack([o, h, l, c, r.uniform(1e4, 1e6, n)])
+
+class FakeExchange:
+    id = "fakebingx"
+
+    def __init__(self, candles=None, timeframe="15m", bars_per_sec=0.0, latency_ms=0.0, jitter_ms=0.0,
+                 error_rate=0.0, rps=0.0, balance=1000.0, fee=0.0005, warmup=600, seed=1, clock=time.time):
+        self.tf_ms=timeframe_ms(timeframe); self.bars_per_sec=bars_per_sec
+        self.latency=latency_ms/1000.0; self.jitter=jitter_ms/1000.0
+        self.error_rate=error_rate; self.rps=rps; self.fee=fee; self.warmup=warmup
+        self.seed=seed; self.clock=clock; self.rng=random.Random(seed)
+        self.candles=candles                    # ndarray [o,h,l,c,v] shared by all symbols, or None
+        self.series={}                          # symbol -> ndarray [o,h,l,c,v]
+        self.t0=clock(); self.base_ts=int(self.t0*1000)//self.tf_ms*self.tf_ms - warmup*self.tf_ms
+        self.cash=balance; self.positions={}; self.orders={}; self.leverage={}
+        self.order_seq=0; self.fills=[]
+        self.tokens=rps; self.refill=clock()
+        self.failures={}                        # method -> [remaining, exception]
+        self.outage_until=0.0
+        self.calls={}; self.errors={}; self.rate_limited=0
+        self.lock=threading.Lock()
+        self.has={'fetchOHLCV': True, 'fetchBalance': True, 'createOrder': True, 'createOrders': True,
+                  'setLeverage': True, 'cancelAllOrders': True}
+
+    # ---- fault injection ----
+    def fail_next(self, method, n=1, exc=ccxt.NetworkError):
+        self.failures[method] = [n, exc]
+
+    def outage(self, seconds): self.outage_until = self.clock() + seconds
+
+    def _gate(self, method):
+        """Latency, rate limit and injected errors in front of every call."""
+        with self.lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+            now = self.clock()
+            if self.rps:
+                self.tokens = min(self.rps, self.tokens + (now - self.refill)*self.rps); self.refill = now
+                if self.tokens < 1:
+                    self.rate_limited += 1
+                    raise ccxt.RateLimitExceeded(f"fake {method}: rate limit {self.rps}/s")
+                self.tokens -= 1
+            f = self.failures.get(method); exc = None
+            if now < self.outage_until: exc = ccxt.ExchangeNotAvailable(f"fake {method}: outage")
+            elif f and f[0] > 0:
+                f[0] -= 1; exc = f[1](f"fake {method}: injected")
+            elif self.error_rate and self.rng.random() < self.error_rate:
+                exc = ccxt.NetworkError(f"fake {method}: injected")
+            delay = self.latency + (self.rng.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay: time.sleep(delay)
+        if exc is not None:
+            self.errors[method] = self.errors.get(method, 0) + 1
+            raise exc
+
+    # ---- market ----
+    def _series(self, symbol):
+        s = self.series.get(symbol)
+        if s is None:
+            s = self.series[symbol] = self.candles if self.candles is not None else \
+                random_walk(seed=self.seed + sum(map(ord, symbol)))
+        return s
+
+    def _pos(self):
+        """Index of the forming bar in the replay."""
+        dt = self.clock() - self.t0
+        step = dt*self.bars_per_sec if self.bars_per_sec else dt*1000/self.tf_ms
+        return self.warmup + int(step)
+
+    def bars(self, symbol, limit=500, since=None):
+        s = self._series(symbol); end = min(self._pos(), len(s) - 1)
+        lo = max(0, end + 1 - limit) if since is None else max(0, (since - self.base_ts)//self.tf_ms)
+        lo = min(lo, end); hi = min(end + 1, lo + limit)
+        return [[self.base_ts + i*self.tf_ms] + [float(x) for x in s[i]] for i in range(lo, hi)]
+
+    def price(self, symbol):
+        s = self._series(symbol); return float(s[min(self._pos(), len(s) - 1)][3])
+
+    def fetch_ohlcv(self, symbol, timeframe="15m", since=None, limit=500, params=None):
+        self._gate("fetch_ohlcv")
+        with self.lock: self._trigger(symbol)
+        return self.bars(symbol, limit, since)
+
+    # ---- account ----
+    def _equity(self):
+        eq = self.cash
+        for sym, p in self.positions.items():
+            eq += p["qty"]*(self.price(sym) - p["entry"])
+        return eq
+
+    def fetch_balance(self, params=None):
+        self._gate("fetch_balance")
+        with self.lock:
+            for sym in list(self.positions): self._trigger(sym)
+            eq = self._equity()
+        return {'USDT': {'free': eq, 'used': 0.0, 'total': eq}, 'total': {'USDT': eq}, 'free': {'USDT': eq}}
+
+    def set_leverage(self, leverage, symbol=None, params=None):
+        self._gate("set_leverage")
+        self.leverage[symbol] = leverage
+        return {'leverage': leverage, 'symbol': symbol}
+
+    # ---- orders ----
+    def _fill(self, symbol, side, amount, price, reduce_only=False, oid=None):
+        p = self.positions.get(symbol)
+        if reduce_only:               # never opens or flips: at most what is left of the position
+            if p is None or p["qty"]*(1 if side == "buy" else -1) >= 0: return None
+            amount = min(amount, abs(p["qty"]))
+            if amount <= 0: return None
+        signed = amount if side == "buy" else -amount
+        self.cash -= abs(amount)*price*self.fee
+        if p is None: self.positions[symbol] = dict(qty=signed, entry=price)
+        elif p["qty"]*signed > 0:
+            q = p["qty"] + signed; p["entry"] = (p["entry"]*p["qty"] + price*signed)/q; p["qty"] = q
+        else:
+            closed = min(abs(signed), abs(p["qty"])) * (1 if p["qty"] > 0 else -1)
+            self.cash += closed*(price - p["entry"]); p["qty"] += signed
+            if abs(p["qty"]) < 1e-12: del self.positions[symbol]
+            elif p["qty"]*signed > 0: p["entry"] = price
+        self.fills.append((self.clock(), symbol, side, amount, price, oid))
+        return amount, price
+
+    def _trigger(self, symbol):
+        """Fire resting TP/SL orders whose trigger the current bar crossed."""
+        s = self._series(symbol); bar = s[min(self._pos(), len(s) - 1)]
+        for oid, o in list(self.orders.items()):
+            if o["symbol"] != symbol: continue
+            hit = (bar[1] >= o["trigger"]) if o["above"] else (bar[2] <= o["trigger"])
+            if hit:
+                del self.orders[oid]
+                self._fill(symbol, o["side"], o["amount"], o["trigger"], reduce_only=True, oid=oid)
+                if symbol not in self.positions:   # flat: the other protection goes with it
+                    for k in [k for k, x in self.orders.items() if x["symbol"] == symbol]: del self.orders[k]
+
+    def _order(self, symbol, type, side, amount, price=None, params=None):
+        params = params or {}
+        self.order_seq += 1; oid = str(self.order_seq); t = type.upper()
+        trigger = params.get("triggerPrice") or params.get("takeProfitPrice") or params.get("stopLossPrice")
+        if trigger is not None:
+            take = t.startswith("TAKE_PROFIT") or "takeProfitPrice" in params
+            # a TP on a sell (long exit) fires above, a stop on a sell fires below
+            above = take == (side == "sell")
+            self.orders[oid] = dict(symbol=symbol, side=side, amount=amount, trigger=float(trigger), above=above, type=t)
+            return dict(id=oid, symbol=symbol, type=type, side=side, amount=amount, status="open", triggerPrice=trigger)
+        px = self.price(symbol)
+        fill = self._fill(symbol, side, amount, px, reduce_only=bool(params.get("reduceOnly")), oid=oid)
+        if fill is None: return dict(id=oid, symbol=symbol, type=type, side=side, amount=amount, filled=0.0, status="canceled")
+        qty, px = fill
+        return dict(id=oid, symbol=symbol, type=type, side=side, amount=amount, filled=qty, average=px,
+                    fee=dict(cost=qty*px*self.fee, currency="USDT"), status="closed")
+
+    def create_order(self, symbol, type, side, amount, price=None, params=None):
+        self._gate("create_order")
+        with self.lock: return self._order(symbol, type, side, amount, price, params)
+
+    def create_orders(self, orders, params=None):
+        self._gate("create_orders")
+        with self.lock:
+            return [self._order(o["symbol"], o["type"], o["side"], o["amount"], o.get("price"), o.get("params")) for o in orders]
+
+    def fetch_positions(self, symbols=None, params=None):
+        self._gate("fetch_positions")
+        with self.lock:
+            for sym in list(self.positions): self._trigger(sym)
+            return [dict(symbol=sym, side="long" if p["qty"] > 0 else "short", contracts=abs(p["qty"]), entryPrice=p["entry"],
+                         markPrice=self.price(sym), unrealizedPnl=p["qty"]*(self.price(sym) - p["entry"]))
+                    for sym, p in self.positions.items() if symbols is None or sym in symbols]
+
+    def fetch_my_trades(self, symbol=None, since=None, limit=None, params=None):
+        self._gate("fetch_my_trades")
+        with self.lock:
+            return [dict(symbol=sym, side=side, amount=amount, price=price, timestamp=int(t*1000), order=oid,
+                         fee=dict(cost=amount*price*self.fee, currency="USDT"))
+                    for t, sym, side, amount, price, oid in self.fills
+                    if (symbol is None or sym == symbol) and (since is None or t*1000 >= since)][-(limit or 500):]
+
+    def cancel_all_orders(self, symbol=None, params=None):
+        self._gate("cancel_all_orders")
+        with self.lock:
+            gone = [oid for oid, o in self.orders.items() if symbol is None or o["symbol"] == symbol]
+            for oid in gone: del self.orders[oid]
+        return [dict(id=oid, status="canceled") for oid in gone]
+
+    def stats(self):
+        return dict(calls=dict(self.calls), errors=dict(self.errors), rate_limited=self.rate_limited,
+                    fills=len(self.fills), open_orders=len(self.orders), positions=len(self.positions),
+                    equity=round(self._equity(), 4))
+
+# ---- bot_core interface (module functions, main.py calls them AS-IS) ----
+def from_env():
+    path = os.getenv("FAKE_CANDLES")
+    candles = None
+    if path:
+        from backtest import load_candles
+        candles = load_candles(path)[["open","high","low","close","volume"]].to_numpy(float)
+    return FakeExchange(candles=candles, bars_per_sec=float(os.getenv("FAKE_BARS_PER_SEC","0")),
+                        latency_ms=float(os.getenv("FAKE_LATENCY_MS","0")), jitter_ms=float(os.getenv("FAKE_JITTER_MS","0")),
+                        error_rate=float(os.getenv("FAKE_ERROR_RATE","0")), rps=float(os.getenv("FAKE_RPS","0")),
+                        balance=float(os.getenv("FAKE_BALANCE","1000")), seed=int(os.getenv("FAKE_SEED","1")))
+
+EX = from_env()
+
+def fetch_ohlcv(symbol, timeframe, limit): return EX.fetch_ohlcv(symbol, timeframe, None, limit)
+def fetch_balance(params): return EX.fetch_balance(params)
+def create_order(symbol, type, side, amount, params): return EX.create_order(symbol, type, side, amount, None, params)
+def create_orders(orders): return EX.create_orders(orders)
+def set_leverage(leverage, symbol, params): return EX.set_leverage(leverage, symbol, params)
+def cancel_all_orders(symbol): return EX.cancel_all_orders(symbol)
+def fetch_positions(symbols=None): return EX.fetch_positions(symbols)
+def fetch_my_trades(symbol, since=None): return EX.fetch_my_trades(symbol, since)
+
+# ---- websocket feed ----
+class WSServer:
+    """Localhost BingX-style swap-market websocket serving the simulator's bars."""
+    def __init__(self, ex=None, host="127.0.0.1", port=0, push_every=0.5, ping_every=5.0):
+        self.ex=ex or EX; self.host=host; self.port=port
+        self.push_every=push_every; self.ping_every=ping_every
+        self.loop=None; self.clients=0; self.frames=0
+        self._ready=threading.Event()
+
+    @property
+    def url(self): return f"ws://{self.host}:{self.port}/swap-market"
+
+    def start(self):
+        threading.Thread(target=self._run, daemon=True, name="fake-ws").start()
+        self._ready.wait(10); return self
+
+    def _run(self):
+        import asyncio
+        from aiohttp import web
+        self.loop = asyncio.new_event_loop(); asyncio.set_event_loop(self.loop)
+        app = web.Application(); app.router.add_get("/swap-market", self._handler)
+        runner = web.AppRunner(app); self.loop.run_until_complete(runner.setup())
+        site = web.TCPSite(runner, self.host, self.port); self.loop.run_until_complete(site.start())
+        self.port = runner.addresses[0][1]; self._ready.set()
+        self.loop.run_forever()
+
+    async def _handler(self, request):
+        import asyncio
+        from aiohttp import web, WSMsgType
+        ws = web.WebSocketResponse(); await ws.prepare(request)
+        self.clients += 1; subs = {}   # dataType -> symbol
+        async def pump():
+            last_ping = time.monotonic()
+            while not ws.closed:
+                for dt, sym in list(subs.items()):
+                    b = self.ex.bars(sym, 1)[-1]
+                    k = dict(T=b[0], o=b[1], h=b[2], l=b[3], c=b[4], v=b[5])
+                    await ws.send_bytes(gzip.compress(json.dumps({"dataType": dt, "data": [k]}).encode()))
+                    self.frames += 1
+                if time.monotonic() - last_ping > self.ping_every:
+                    await ws.send_bytes(gzip.compress(b"Ping")); last_ping = time.monotonic()
+                await asyncio.sleep(self.push_every)
+        task = asyncio.ensure_future(pump())
+        try:
+            async for msg in ws:
+                if msg.type != WSMsgType.TEXT or msg.data == "Pong": continue
+                req = json.loads(msg.data)
+                if req.get("reqType") == "sub":
+                    dt = req["dataType"]; base = dt.split("@")[0].split("-")
+                    subs[dt] = f"{base[0]}/{base[1]}:{base[1]}"
+                    await ws.send_str(json.dumps({"id": req.get("id"), "code": 0, "msg": ""}))
+        finally:
+            task.cancel(); self.clients -= 1
+        return ws
+
+# ---- load test ----
+def loadtest(a):
+    """Run main.py's loop against the simulator for a.seconds and report."""
+    syms = ",".join(f"SIM{i}/USDT:USDT" for i in range(a.symbols))
+    os.environ.update(BOT_CORE_MODULE="fake_exchange", SYMBOLS=syms, MAX_OPEN_POSITIONS=str(a.max_open),
+                      SCAN_MAX_RPS=str(a.scan_rps), FAKE_LATENCY_MS=str(a.latency), FAKE_JITTER_MS=str(a.jitter),
+                      FAKE_ERROR_RATE=str(a.error_rate), FAKE_RPS=str(a.rps), FAKE_BARS_PER_SEC=str(a.bars_per_sec),
+                      JOURNAL_DIR="", SNAPSHOT_PATH="", ENGINE_LOCK="")
+    os.environ.setdefault("BINGX_API_KEY", "fake"); os.environ.setdefault("BINGX_API_SECRET", "fake")
+    global EX
+    EX = from_env(); sys.modules.setdefault("fake_exchange", sys.modules[__name__])
+    if a.ws:
+        srv = WSServer(EX).start()
+        os.environ.update(MARKET_FEED="ws", FEED_URL=srv.url)
+    import instrument, main
+    main.start_engine()
+    time.sleep(a.seconds)
+    snap = instrument.snapshot()
+    out = dict(symbols=a.symbols, seconds=a.seconds, exchange=EX.stats(),
+               trades=main.SHARED.view().total_trades, open=main.open_positions(), ledger=main.LEDGER.stats(),
+               booked={k: getattr(main.SHARED.view(), k) for k in ("successful_trades", "failed_trades", "compound_profit")},
+               tick=snap["histograms"].get('probot_stage_seconds{stage="tick"}'),
+               counters={k: v for k, v in snap["counters"].items() if "retr" in k or "circuit" in k})
+    print(json.dumps(out, indent=2, default=str))
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Offline BingX simulator")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    lt = sub.add_parser("loadtest", help="run main.py against the simulator")
+    lt.add_argument("--symbols", type=int, default=10)
+    lt.add_argument("--seconds", type=float, default=30)
+    lt.add_argument("--max-open", type=int, default=3)
+    lt.add_argument("--scan-rps", type=float, default=50)
+    lt.add_argument("--latency", type=float, default=50, help="ms")
+    lt.add_argument("--jitter", type=float, default=20, help="ms")
+    lt.add_argument("--error-rate", type=float, default=0.02)
+    lt.add_argument("--rps", type=float, default=0, help="exchange rate limit, 0 = none")
+    lt.add_argument("--bars-per-sec", type=float, default=2)
+    lt.add_argument("--ws", action="store_true", help="also serve the websocket feed")
+    ws = sub.add_parser("ws", help="serve the websocket feed only")
+    ws.add_argument("--port", type=int, default=8765)
+    a = ap.parse_args()
+    if a.cmd == "loadtest": loadtest(a)
+    else:
+        srv = WSServer(EX, port=a.port).start(); print(f"serving {srv.url}")
+        threading.Event().wait()
@@ -6,5 +6,6 @@ except Exception:
     @app.get("/")
     def _health(): return "OK"
 if __name__ == "__main__":
-    import os
+    import os, sys
+    if "main" in sys.modules: sys.modules["main"].start_engine()
     app.run(host="0.0.0.0", port=int(os.getenv("PORT",8000)))
@@ -0,0 +1,15 @@
+"""
+gunicorn.conf.py
+----------------
+Read by gunicorn from the working directory. One worker (gthread, many threads):
+the dashboards and /metrics read the engine's in-process state, so a second
+worker would serve an empty board. The worker imports `fix_bind_port:app`
+(routes and state only) and starts the trading engine once booted; ENGINE_LOCK
+still keeps a second process on the host from trading too. Do not add
+`--preload`: engine threads started in the master would not survive the fork.
+"""
+workers = 1
+
+def post_worker_init(worker):
+    import main
+    main.start_engine()
@@ -1,42 +1,63 @@
-from flask import Blueprint, render_template_string, jsonify
-import time
+from flask import Blueprint, Response, request
+from types import MappingProxyType
+import instrument
+from metrics_stream import Broadcaster
+import os, json, time, threading
 bp = Blueprint("metrics", __name__)
 def _g(M, n, d=None): return getattr(M, n, d)
-def _ctx():
-    try: import main as M
-    except Exception:
-        class X: pass
-        M = X()
+def _module(M=None):
+    if M is None:
+        try: import main as M
+        except Exception:
+            class X: pass
+            M = X()
+    return M
+def _ctx(M=None):
+    """State the dashboard shows; changes only when the engine's state does (diffed per version)."""
+    M = _module(M)
+    S = M.SHARED.view() if hasattr(M, "SHARED") else M   # one published version: never torn
     return dict(
-        total_trades=_g(M,"total_trades",0),
-        successful_trades=_g(M,"successful_trades",0),
-        failed_trades=_g(M,"failed_trades",0),
-        compound_profit=_g(M,"compound_profit",0.0),
-        balance=_g(M,"cached_balance",None),
-        current_price=_g(M,"current_price",0.0),
-        ema200=_g(M,"ema_200_value",0.0),
-        ema20=_g(M,"ema20_value",None),
-        ema50=_g(M,"ema50_value",None),
-        rsi=_g(M,"rsi_value",0.0),
-        adx=_g(M,"adx_value",0.0),
-        atr=_g(M,"current_atr",0.0),
-        range_pct=_g(M,"price_range_value",None),
-        bb_width=_g(M,"bb_width",None),
-        supertrend=_g(M,"supertrend_dir_value",None),
-        cooldown_reason=_g(M,"cooldown_reason",""),
-        position_open=bool(_g(M,"position_open",False)),
-        position_side=_g(M,"position_side","N/A"),
-        entry_price=_g(M,"entry_price",0.0),
-        tp1_price=_g(M,"tp1_price",0.0),
-        tp2_price=_g(M,"tp2_price",0.0),
-        sl_price=_g(M,"sl_price",0.0),
-        trailing_active=_g(M,"trailing_active",False),
-        pnl=_g(M,"current_pnl",0.0),
+        total_trades=_g(S,"total_trades",0),
+        successful_trades=_g(S,"successful_trades",0),
+        failed_trades=_g(S,"failed_trades",0),
+        compound_profit=_g(S,"compound_profit",0.0),
+        balance=_g(S,"cached_balance",None),
+        current_price=_g(S,"current_price",0.0),
+        ema200=_g(S,"ema_200_value",0.0),
+        ema20=_g(S,"ema20_value",None),
+        ema50=_g(S,"ema50_value",None),
+        rsi=_g(S,"rsi_value",0.0),
+        adx=_g(S,"adx_value",0.0),
+        atr=_g(S,"current_atr",0.0),
+        range_pct=_g(S,"price_range_value",None),
+        bb_width=_g(S,"bb_width",None),
+        supertrend=_g(S,"supertrend_dir_value",None),
+        cooldown_reason=_g(S,"cooldown_reason",""),
+        position_open=bool(_g(S,"position_open",False)),
+        position_side=_g(S,"position_side","N/A"),
+        entry_price=_g(S,"entry_price",0.0),
+        tp1_price=_g(S,"tp1_price",0.0),
+        tp2_price=_g(S,"tp2_price",0.0),
+        sl_price=_g(S,"sl_price",0.0),
+        trailing_active=_g(S,"trailing_active",False),
+        pnl=_g(S,"current_pnl",0.0),
         leverage=_g(M,"LEVERAGE",10),
         risk_alloc=_g(M,"RISK_ALLOC",0.6),
         timeframe=_g(M,"INTERVAL","15m"),
         trade_mode=_g(M,"TRADE_MODE","live"),
-        update_time=_g(M,"update_time",time.strftime("%Y-%m-%d %H:%M:%S"))
+        update_time=_g(S,"update_time",time.strftime("%Y-%m-%d %H:%M:%S")),
+        symbols=list(_g(S,"symbols",())),
+        ledger=_g(M,"ledger_stats",lambda: {})(),
+    )
+def _stats_ctx(M=None):
+    """Counters and histograms: move on every tick, so never diffed; see `stats()`."""
+    M = _module(M)
+    return dict(
+        balance_cache=_g(M,"balance_cache_stats",lambda: {})(),
+        rate_limit=_g(M,"rate_limit_stats",lambda: {})(),
+        breakers=_g(M,"breaker_stats",lambda: {})(),
+        exits=_g(M,"exit_stats",lambda: {})(),
+        latency=instrument.snapshot()["histograms"]
     )
 HTML = """<!doctype html><html><head><meta charset="utf-8"/><meta name="viewport" content="width=device-width,initial-scale=1.0"/>
 <title>Metrics</title>
@@ -80,8 +101,112 @@ body{margin:0;background:var(--bg);color:var(--text);font-family:system-ui,-appl
 <div class="k" style="margin-top:8px">Last update: {{ update_time }}</div></div>
 </div></div></body></html>
 """
+# ---- Published snapshot: built once per tick by the trading loop, rendered once per version ----
+class Snapshot:
+    __slots__ = ("version", "ctx", "at", "_html", "_json")
+    def __init__(self, version, ctx):
+        self.version=version; self.ctx=MappingProxyType(ctx); self.at=time.monotonic()
+        self._html=None; self._json=(None, None)
+    def etag(self, kind, st=None):
+        v = self.version if st is None else f"{self.version}.{st.gen}"
+        return f"{BOOT}-{v}-{kind}"   # versions restart at 1 with the process
+    def body(self, kind, st=None):
+        # two racing requests may both render; same bytes, harmless
+        if kind == "html":
+            if self._html is None: self._html = _TPL["html"].render(**self.ctx).encode("utf-8")
+            return self._html
+        gen, b = self._json
+        if gen != st.gen:
+            b = json.dumps({**self.ctx, **st.value}, default=str).encode("utf-8"); self._json = (st.gen, b)
+        return b
+class Stats:
+    __slots__ = ("gen", "value", "at", "body")
+    def __init__(self, gen, value):
+        self.gen=gen; self.value=value; self.at=time.monotonic(); self.body=json.dumps(value, default=str)
+_TPL = {}
+_SNAP = None
+STREAM = Broadcaster(maxlen=32)
+_PUB = dict(lock=threading.Lock(), by_loop=False, last=0.0, trailing=None)
+BOOT = f"{os.getpid():x}{time.time_ns():x}"   # per process start, in every ETag
+FALLBACK_MAX_AGE = 1.0     # s; request-built snapshots when no trading loop publishes (web-only worker)
+STATS_INTERVAL = 5.0       # s; counters/histograms are rebuilt at most this often, on a web thread
+_STATS = dict(lock=threading.Lock(), cur=None, pusher=None)
+def stats(max_age=STATS_INTERVAL):
+    """Current Stats, rebuilt by whichever web thread finds it older than `max_age` s."""
+    st = _STATS["cur"]
+    if st is None or time.monotonic() - st.at >= max_age:
+        with _STATS["lock"]:
+            st = _STATS["cur"]
+            if st is None or time.monotonic() - st.at >= max_age:
+                st = _STATS["cur"] = Stats((st.gen + 1) if st else 1, _stats_ctx())
+    return st
+def _push_stats():
+    """SSE: one `stats` event per STATS_INTERVAL while anyone is connected."""
+    while True:
+        time.sleep(STATS_INTERVAL)
+        with _STATS["lock"]:
+            if not STREAM.clients: _STATS["pusher"] = None; return
+        STREAM.publish(f"event: stats\ndata: {stats(0).body}\n\n")
+def _start_pusher():
+    with _STATS["lock"]:
+        if _STATS["pusher"] is None:
+            _STATS["pusher"] = threading.Thread(target=_push_stats, daemon=True, name="metrics-stats")
+            _STATS["pusher"].start()
+def publish(M=None, min_interval=0.25):
+    """Trading loop: freeze the metrics context for dashboard readers. Cheap no-op if nothing changed."""
+    global _SNAP
+    now = time.monotonic()
+    if M is not None:
+        _PUB["by_loop"] = True
+        if _SNAP is not None and now - _PUB["last"] < min_interval:
+            _schedule(M, _PUB["last"] + min_interval - now); return _SNAP
+    with _PUB["lock"]:
+        ctx = _ctx(M); _PUB["last"] = now
+        snap = _SNAP
+        if snap is not None and dict(snap.ctx) == ctx: return snap
+        _SNAP = Snapshot((snap.version + 1) if snap else 1, ctx)
+        if STREAM.clients:
+            old = snap.ctx if snap else {}
+            diff = {k: v for k, v in ctx.items() if old.get(k) != v}
+            STREAM.publish(f"event: diff\nid: {_SNAP.version}\ndata: {json.dumps(diff, default=str)}\n\n")
+        return _SNAP
+def _schedule(M, delay):
+    """Throttled publish: publish once more when the interval ends (trailing edge), so a change
+    made just after a tick (an exit from the exit-manager thread) does not wait for the next one."""
+    with _PUB["lock"]:
+        if _PUB["trailing"] is not None: return
+        t = _PUB["trailing"] = threading.Timer(delay, _trailing, (M,)); t.daemon = True
+    t.start()
+def _trailing(M):
+    with _PUB["lock"]: _PUB["trailing"] = None
+    publish(M, 0.0)
+def _current():
+    snap = _SNAP
+    if snap is None or (not _PUB["by_loop"] and time.monotonic() - snap.at > FALLBACK_MAX_AGE):
+        snap = publish()
+    return snap
+def _serve(kind, mimetype):
+    snap = _current(); st = stats() if kind == "json" else None; tag = snap.etag(kind, st)
+    if request.if_none_match.contains(tag):
+        r = Response(status=304)
+    else:
+        r = Response(snap.body(kind, st), mimetype=mimetype)
+    r.set_etag(tag); r.headers["Cache-Control"] = "no-cache"
+    return r
 @bp.route("/metrics")
-def metrics_html(): return render_template_string(HTML, **_ctx())
+def metrics_html(): return _serve("html", "text/html")
 @bp.route("/metrics/json")
-def metrics_json(): return jsonify(_ctx())
-def register_metrics(app): app.register_blueprint(bp)
+def metrics_json(): return _serve("json", "application/json")
+@bp.route("/metrics/stream")
+def metrics_stream():
+    def full():
+        snap = _current(); return snap.version, snap.body("json", stats()).decode("utf-8")
+    client = STREAM.subscribe(); _start_pusher()
+    r = Response(STREAM.frames(client, full), mimetype="text/event-stream")
+    r.headers["Cache-Control"] = "no-cache"; r.headers["X-Accel-Buffering"] = "no"
+    return r
+@bp.route("/metrics/prom")
+def metrics_prom(): return Response(instrument.render_prom(), mimetype="text/plain; version=0.0.4")
+def register_metrics(app):
+    _TPL["html"] = app.jinja_env.from_string(HTML)   # compiled once, not per request
+    app.register_blueprint(bp)
@@ -0,0 +1,173 @@
+"""
+indicators_stream.py
+--------------------
+O(1)-per-bar replacements for the `ta` indicators used by main.compute_indicators.
+
+Each indicator keeps its Wilder/EMA state for the *closed* bars only. The forming
+bar is evaluated on top of that state without mutating it, so it can change any
+number of times; the state advances once, when a newer bar timestamp shows up.
+
+Formulas follow `ta` (0.10/0.11) exactly, including its seeding:
+  * EMA  : ewm(span=n, adjust=False), seeded with the first close, NaN before n bars
+  * RSI  : Wilder ewm(alpha=1/n) of up/down moves (first move 0), NaN before n bars, 100 if no losses
+  * ATR  : mean of the first n true ranges, then Wilder; 0 before that
+  * ADX  : Wilder sums of TR/+DM/-DM from bar 1, ADX = mean of first n DX then Wilder; 0 before
+  * BB   : rolling mean / population std (ddof=0)
+so over the same bar history `parity_check(df)` returns relative differences at
+float noise; `python benchmarks.py --only parity` fails if any exceeds 1e-9.
+"""
+import math
+import numpy as np
+from collections import deque
+
+NAN = float('nan')
+
+class EMA:
+    __slots__ = ('n', 'a', 's')
+    def __init__(self, n):
+        self.n=n; self.a=2.0/(n+1); self.s=(0, 0.0)      # (count, value)
+    def _next(self, s, bar, prev):
+        cnt, v = s; x = bar[4]
+        v = x if cnt == 0 else (1-self.a)*v + self.a*x
+        return (cnt+1, v), (v if cnt+1 >= self.n else NAN)
+
+class RSI:
+    __slots__ = ('n', 'a', 's')
+    def __init__(self, n=14):
+        self.n=n; self.a=1.0/n; self.s=(0, 0.0, 0.0)    # (bars, avg_up, avg_down)
+    def _next(self, s, bar, prev):
+        cnt, up, dn = s; d = bar[4] - prev[4] if prev is not None else 0.0   # ta fills the first diff with 0
+        u = d if d > 0 else 0.0; w = -d if d < 0 else 0.0
+        if cnt == 0: up, dn = u, w
+        else: up = (1-self.a)*up + self.a*u; dn = (1-self.a)*dn + self.a*w
+        cnt += 1
+        if cnt < self.n: return (cnt, up, dn), NAN
+        return (cnt, up, dn), (100.0 if dn == 0 else 100.0 - 100.0/(1.0 + up/dn))
+
+def _true_range(bar, prev):
+    if prev is None: return bar[2] - bar[3]
+    pc = prev[4]
+    return max(bar[2] - bar[3], abs(bar[2] - pc), abs(bar[3] - pc))
+
+class ATR:
+    __slots__ = ('n', 's')
+    def __init__(self, n=14):
+        self.n=n; self.s=(0, 0.0, 0.0)                   # (count, tr_sum, atr)
+    def _next(self, s, bar, prev):
+        cnt, acc, atr = s; tr = _true_range(bar, prev); n = self.n
+        if cnt < n - 1: return (cnt+1, acc+tr, 0.0), 0.0
+        atr = (acc+tr)/n if cnt == n - 1 else (atr*(n-1) + tr)/n
+        return (cnt+1, 0.0, atr), atr
+
+class ADX:
+    __slots__ = ('n', 's')
+    def __init__(self, n=14):
+        self.n=n; self.s=(0, 0.0, 0.0, 0.0, 0.0, 0.0)   # (bars, trs, +dm, -dm, dx_sum, adx)
+    def _next(self, s, bar, prev):
+        j, trs, dip, din, dxs, adx = s; n = self.n
+        if prev is None: return (1, trs, dip, din, dxs, adx), 0.0
+        up = bar[2] - prev[2]; down = prev[3] - bar[3]
+        pos = up if (up > down and up > 0) else 0.0
+        neg = down if (down > up and down > 0) else 0.0
+        tr = max(bar[2], prev[4]) - min(bar[3], prev[4])
+        if j <= n:                                        # bars 1..n seed the Wilder sums
+            trs += tr; dip += pos; din += neg
+            if j < n: return (j+1, trs, dip, din, dxs, adx), 0.0
+        else:
+            trs = trs - trs/n + tr; dip = dip - dip/n + pos; din = din - din/n + neg
+        pdi = 100*dip/trs if trs != 0 else 0.0
+        ndi = 100*din/trs if trs != 0 else 0.0
+        dx = 100*abs((pdi-ndi)/(pdi+ndi)) if pdi + ndi != 0 else 0.0
+        if j < 2*n - 1: return (j+1, trs, dip, din, dxs+dx, adx), 0.0
+        adx = (dxs+dx)/n if j == 2*n - 1 else (adx*(n-1) + dx)/n
+        return (j+1, trs, dip, din, 0.0, adx), adx
+
+class BBWidth:
+    """Bollinger band width in % of close: (hband - lband) / close * 100."""
+    __slots__ = ('n', 'dev', 'closes')
+    def __init__(self, n=20, dev=2):
+        self.n=n; self.dev=dev; self.closes=deque(maxlen=n-1)
+    def value(self, bar):
+        if len(self.closes) < self.n - 1: return NAN
+        win = list(self.closes); win.append(bar[4])
+        m = sum(win)/self.n
+        sd = math.sqrt(sum((x-m)*(x-m) for x in win)/self.n)
+        return ((m + self.dev*sd) - (m - self.dev*sd)) / bar[4] * 100.0
+
+class StreamingIndicators:
+    """
+    Feed bars as [ts, open, high, low, close, volume]. `values` always reflects the
+    forming (last) bar, except `rsi_prev` which is RSI of the last closed bar
+    (what compute_indicators read as rsi.iloc[-2]).
+    """
+    def __init__(self):
+        self.ind = dict(ema20=EMA(20), ema50=EMA(50), ema200=EMA(200), rsi=RSI(14), atr=ATR(14), adx=ADX(14))
+        self.bb = BBWidth(20, 2)
+        self.prev = None; self.forming = None; self.bars = 0
+        self.rsi_prev = NAN
+        self.values = {}
+
+    def reset(self): self.__init__()
+
+    def _commit(self, bar):
+        for k, ind in self.ind.items():
+            ind.s, v = ind._next(ind.s, bar, self.prev)
+            if k == 'rsi': self.rsi_prev = v
+        self.bb.closes.append(bar[4])
+        self.prev = bar; self.bars += 1
+
+    def _evaluate(self, bar):
+        vals = {k: ind._next(ind.s, bar, self.prev)[1] for k, ind in self.ind.items()}
+        vals['bb_width'] = self.bb.value(bar)
+        vals['rsi_prev'] = self.rsi_prev
+        self.values = vals
+
+    def update(self, bar):
+        """Apply one bar; returns False when it is older than the forming bar."""
+        if self.forming is not None:
+            if bar[0] < self.forming[0]: return False
+            if bar[0] > self.forming[0]: self._commit(self.forming)
+        self.forming = list(bar)
+        self._evaluate(self.forming)
+        return True
+
+    def sync(self, ts, ohlcv):
+        """
+        Bring the engine up to date with an ascending window of bars, as the
+        CandleStore.ts / CandleStore.ohlcv views. Only bars at/after the forming one
+        are applied; an empty engine, or one whose forming bar has fallen out of the
+        window, is warmed from the whole window.
+        """
+        n = len(ts)
+        if not n: return 0
+        if self.forming is None or self.forming[0] < ts[0]:
+            self.reset(); start = 0
+        else:
+            start = int(np.searchsorted(ts, self.forming[0], "left"))
+        # plain Python floats: the per-bar recursions are scalar code
+        for t, px in zip(ts[start:].tolist(), ohlcv[start:].tolist()): self.update([t] + px)
+        return n - start
+
+def parity_check(df, eng=None):
+    """
+    |stream - ta| / |ta| per indicator at the last bar of df (columns open/high/low/close).
+    `eng` is an engine already fed the same history (e.g. through sliding `sync` windows);
+    by default a fresh one is fed df bar by bar.
+    """
+    import ta
+    close=df["close"]; high=df["high"]; low=df["low"]
+    ref = dict(
+        rsi_prev=ta.momentum.RSIIndicator(close=close, window=14).rsi().iloc[-2],
+        adx=ta.trend.ADXIndicator(high=high, low=low, close=close, window=14).adx().iloc[-1],
+        ema20=ta.trend.EMAIndicator(close=close, window=20).ema_indicator().iloc[-1],
+        ema50=ta.trend.EMAIndicator(close=close, window=50).ema_indicator().iloc[-1],
+        ema200=ta.trend.EMAIndicator(close=close, window=200).ema_indicator().iloc[-1],
+        atr=ta.volatility.AverageTrueRange(high=high, low=low, close=close, window=14).average_true_range().iloc[-1],
+    )
+    bb = ta.volatility.BollingerBands(close=close, window=20, window_dev=2)
+    ref['bb_width'] = ((bb.bollinger_hband() - bb.bollinger_lband()) / close).iloc[-1]*100.0
+    if eng is None:
+        eng = StreamingIndicators()
+        for i, r in enumerate(df[["open","high","low","close"]].itertuples(index=False)):
+            eng.update([i, r[0], r[1], r[2], r[3], 0.0])
+    return {k: abs(float(v) - eng.values[k]) / max(abs(float(v)), 1e-12) for k, v in ref.items()}
@@ -0,0 +1,149 @@
+"""
+instrument.py
+-------------
+Hot-path instrumentation: stage timers, latency histograms and counters, exposed
+in Prometheus text format on /metrics/prom.
+
+Writers never take a lock: every thread records into its own thread-local
+buckets (a list increment after a bisect), and a scrape merges all threads'
+buckets. p50/p95/p99 are estimated from the merged histogram the same way
+Prometheus' histogram_quantile() does (linear inside the bucket).
+
+    with timer("get_klines"): ...
+    @timed("signal")
+    def signal(...): ...
+    inc("retries_total", fn="core_fetch_ohlcv")
+    with trace() as stages: tick()    # stages: {stage: seconds} timed on this thread
+"""
+import time, bisect, threading, functools, asyncio
+
+BOUNDS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+          0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+QUANTILES = (0.5, 0.95, 0.99)
+PREFIX = "probot_"
+
+_local = threading.local()
+_shards = []                 # every thread's (hists, counters); list.append is atomic
+_gauges = {}
+
+def _shard():
+    s = getattr(_local, "shard", None)
+    if s is None:
+        s = _local.shard = ({}, {})
+        _shards.append(s)
+    return s
+
+def _key(name, labels): return (name, tuple(sorted(labels.items())))
+
+def observe(name, seconds, **labels):
+    hists = _shard()[0]; k = _key(name, labels)
+    h = hists.get(k)
+    if h is None: h = hists[k] = [[0]*(len(BOUNDS)+1), 0.0]
+    h[0][bisect.bisect_left(BOUNDS, seconds)] += 1
+    h[1] += seconds
+
+def inc(name, n=1, **labels):
+    counters = _shard()[1]; k = _key(name, labels)
+    counters[k] = counters.get(k, 0) + n
+
+def gauge(name, value, **labels): _gauges[_key(name, labels)] = value
+
+class timer:
+    """Context manager observing elapsed seconds into stage_seconds{stage=...}."""
+    __slots__ = ("stage", "t0")
+    def __init__(self, stage): self.stage = stage
+    def __enter__(self): self.t0 = time.perf_counter(); return self
+    def __exit__(self, *exc):
+        dt = time.perf_counter() - self.t0
+        observe("stage_seconds", dt, stage=self.stage)
+        t = getattr(_local, "trace", None)
+        if t is not None: t[self.stage] = t.get(self.stage, 0.0) + dt
+
+class trace:
+    """Also collect this thread's stage timings into a dict while active (log records of one tick)."""
+    __slots__ = ("stages", "prev")
+    def __enter__(self):
+        self.prev = getattr(_local, "trace", None); self.stages = _local.trace = {}
+        return self.stages
+    def __exit__(self, *exc): _local.trace = self.prev
+
+def timed(stage):
+    def deco(fn):
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def aw(*a, **k):
+                with timer(stage): return await fn(*a, **k)
+            return aw
+        @functools.wraps(fn)
+        def w(*a, **k):
+            with timer(stage): return fn(*a, **k)
+        return w
+    return deco
+
+# ---- scrape side ----
+def _merged():
+    hists, counters = {}, {}
+    for hs, cs in list(_shards):
+        for k, (b, total) in list(hs.items()):
+            m = hists.setdefault(k, [[0]*(len(BOUNDS)+1), 0.0])
+            for i, v in enumerate(b): m[0][i] += v
+            m[1] += total
+        for k, v in list(cs.items()): counters[k] = counters.get(k, 0) + v
+    return hists, counters
+
+def quantile(buckets, q):
+    total = sum(buckets)
+    if total == 0: return None
+    rank = q*total; cum = 0
+    for i, c in enumerate(buckets):
+        if cum + c >= rank and c:
+            if i >= len(BOUNDS): return BOUNDS[-1]
+            lo = BOUNDS[i-1] if i else 0.0
+            return lo + (BOUNDS[i] - lo)*(rank - cum)/c
+        cum += c
+    return BOUNDS[-1]
+
+def snapshot():
+    """Plain dict: per histogram count/sum/p50/p95/p99, counters and gauges."""
+    hists, counters = _merged()
+    out = {"histograms": {}, "counters": {}, "gauges": {}}
+    for (name, labels), (b, total) in hists.items():
+        d = dict(count=sum(b), sum=round(total, 6))
+        for q in QUANTILES: d[f"p{int(q*100)}"] = quantile(b, q)
+        out["histograms"][_fmt(name, labels)] = d
+    for (name, labels), v in counters.items(): out["counters"][_fmt(name, labels)] = v
+    for (name, labels), v in list(_gauges.items()): out["gauges"][_fmt(name, labels)] = v
+    return out
+
+def _fmt(name, labels, extra=()):
+    lab = ",".join(f'{k}="{v}"' for k, v in tuple(labels) + tuple(extra))
+    return f"{PREFIX}{name}{{{lab}}}" if lab else f"{PREFIX}{name}"
+
+def render_prom():
+    hists, counters = _merged(); lines = []
+    for name in sorted({k[0] for k in hists}):
+        lines.append(f"# TYPE {PREFIX}{name} histogram")
+        for (n, labels), (b, total) in sorted(hists.items()):
+            if n != name: continue
+            cum = 0
+            for i, c in enumerate(b):
+                cum += c; le = "+Inf" if i >= len(BOUNDS) else repr(BOUNDS[i])
+                lines.append(f"{_fmt(name + '_bucket', labels, (('le', le),))} {cum}")
+            lines.append(f"{_fmt(name + '_sum', labels)} {total}")
+            lines.append(f"{_fmt(name + '_count', labels)} {cum}")
+        lines.append(f"# TYPE {PREFIX}{name}_quantile gauge")
+        for (n, labels), (b, total) in sorted(hists.items()):
+            if n != name: continue
+            for q in QUANTILES:
+                v = quantile(b, q)
+                if v is not None: lines.append(f"{_fmt(name + '_quantile', labels, (('quantile', q),))} {v}")
+    for name in sorted({k[0] for k in counters}):
+        lines.append(f"# TYPE {PREFIX}{name} counter")
+        for (n, labels), v in sorted(counters.items()):
+            if n == name: lines.append(f"{_fmt(name, labels)} {v}")
+    gauges = sorted(_gauges.items())
+    for name in sorted({k[0] for k, _ in gauges}):
+        lines.append(f"# TYPE {PREFIX}{name} gauge")
+        for (n, labels), v in gauges:
+            if n == name: lines.append(f"{_fmt(name, labels)} {v}")
+    return "\n".join(lines) + "\n"
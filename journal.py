@@ -0,0 +1,203 @@
+"""
+journal.py
+----------
+Append-only, columnar on-disk journal for closed candles, fills and signals.
+
+Every stream is a directory of fixed-width binary segments (NumPy structured
+records, no header): `a-<seq>.bin` segments are appended to as events happen and
+rotated every `seg_records` records (on open, a partial record left at the end of
+the last one by a crash is cut off, so later appends stay aligned); the background compactor merges closed
+segments into one time-sorted `c-<seq>.bin` (candles also de-duplicated by
+timestamp) and swaps it in atomically. Reads memory-map the segments (zero-copy),
+skip segments outside the requested range and binary-search sorted ones.
+
+    J = Journal("journal")
+    J.append_candle("DOGE/USDT:USDT", "15m", [ts, o, h, l, c, v])
+    J.candles("DOGE/USDT:USDT", "15m", start=ts0, end=ts1)   # structured array
+    J.candles_frame(...)                                      # DataFrame for backtest.py
+"""
+import os, re, time, threading
+import numpy as np
+
+CANDLE = np.dtype([("ts","<i8"),("open","<f8"),("high","<f8"),("low","<f8"),("close","<f8"),("volume","<f8")])
+FILL   = np.dtype([("ts","<i8"),("symbol","S24"),("side","S8"),("kind","S8"),("qty","<f8"),("price","<f8"),("pnl","<f8"),("order_id","S40")])
+SIGNAL = np.dtype([("ts","<i8"),("symbol","S24"),("side","S8"),("price","<f8"),("taken","?"),("why","S64")])
+
+_SEG = re.compile(r"^([ac])-(\d{8})\.bin$")
+
+def _now_ms(): return int(time.time()*1000)
+
+def _safe(name): return re.sub(r"[^A-Za-z0-9]+", "_", name).strip("_")
+
+class Stream:
+    def __init__(self, path, dtype, seg_records=100_000, unique_ts=False):
+        self.path=path; self.dtype=dtype; self.seg_records=seg_records; self.unique_ts=unique_ts
+        self.lock=threading.Lock()
+        os.makedirs(path, exist_ok=True)
+        segs = self._list()
+        self.seq = max((s for _, s, _ in segs), default=0)
+        last = segs[-1] if segs else None
+        self.torn = 0   # bytes of a partial record cut off the last segment (crash mid-append)
+        if last and last[0] == "a":
+            size = os.path.getsize(last[2]); whole = self._count(last[2])*dtype.itemsize
+            if size != whole: os.truncate(last[2], whole); self.torn = size - whole
+        if last and last[0] == "a" and self._count(last[2]) < seg_records:
+            self.active = last[2]
+        else:
+            self.active = self._new_active()
+        self._fh = open(self.active, "ab")
+
+    def _list(self):
+        out = []
+        for f in os.listdir(self.path):
+            m = _SEG.match(f)
+            if m: out.append((m.group(1), int(m.group(2)), os.path.join(self.path, f)))
+        return sorted(out, key=lambda x: x[1])
+
+    def _new_active(self):
+        self.seq += 1
+        return os.path.join(self.path, f"a-{self.seq:08d}.bin")
+
+    def _count(self, f): return os.path.getsize(f) // self.dtype.itemsize
+
+    def append(self, rows):
+        """rows: list of tuples in dtype field order (or a structured array)."""
+        arr = np.asarray(rows, dtype=self.dtype) if not isinstance(rows, np.ndarray) else rows.astype(self.dtype, copy=False)
+        with self.lock:
+            self._fh.write(arr.tobytes()); self._fh.flush()
+            if self._count(self.active) >= self.seg_records:
+                self._fh.close(); self.active = self._new_active(); self._fh = open(self.active, "ab")
+
+    def _map(self, f):
+        n = self._count(f)
+        if n == 0: return np.empty(0, dtype=self.dtype)
+        return np.memmap(f, dtype=self.dtype, mode="r", shape=(n,))
+
+    def read(self, start=None, end=None):
+        """Records with start <= ts <= end (either bound optional), sorted by ts."""
+        for attempt in range(3):
+            try: return self._read(start, end)
+            except FileNotFoundError:   # a compaction swapped segments under us; list again
+                if attempt == 2: raise
+
+    def _read(self, start, end):
+        with self.lock: segs = self._list()
+        parts = []
+        for kind, _, f in segs:
+            a = self._map(f)
+            if not len(a): continue
+            ts = a["ts"]
+            if kind == "c":
+                if (start is not None and ts[-1] < start) or (end is not None and ts[0] > end): continue
+                lo = 0 if start is None else np.searchsorted(ts, start, "left")
+                hi = len(a) if end is None else np.searchsorted(ts, end, "right")
+                parts.append(a[lo:hi])
+            else:
+                m = np.ones(len(a), bool)
+                if start is not None: m &= ts >= start
+                if end is not None: m &= ts <= end
+                parts.append(a[m])
+        if not parts: return np.empty(0, dtype=self.dtype)
+        out = np.concatenate(parts)
+        out = out[np.argsort(out["ts"], kind="stable")]
+        return self._dedup(out) if self.unique_ts else out
+
+    def _dedup(self, a):
+        if len(a) < 2: return a
+        keep = np.r_[a["ts"][1:] != a["ts"][:-1], True]     # last write wins
+        return a[keep]
+
+    def compact(self):
+        """Merge all closed segments into one sorted segment. Returns merged segment count."""
+        with self.lock:
+            segs = [s for s in self._list() if s[2] != self.active]
+        if len(segs) < 2 and not (segs and segs[0][0] == "a"): return 0
+        merged = np.concatenate([np.array(self._map(f)) for _, _, f in segs]) if segs else np.empty(0, self.dtype)
+        merged = merged[np.argsort(merged["ts"], kind="stable")]
+        if self.unique_ts: merged = self._dedup(merged)
+        seq = segs[-1][1]
+        final = os.path.join(self.path, f"c-{seq:08d}.bin"); tmp = final + ".tmp"
+        merged.tofile(tmp)
+        with self.lock:
+            os.replace(tmp, final)
+            for _, _, f in segs:
+                if f != final: os.remove(f)
+        return len(segs)
+
+    def close(self):
+        with self.lock: self._fh.close()
+
+class Journal:
+    def __init__(self, root="journal", seg_records=100_000):
+        self.root=root; self.seg_records=seg_records
+        self.streams={}; self.lock=threading.Lock()
+        self._compactor=None
+
+    def _stream(self, rel, dtype, unique_ts=False):
+        s = self.streams.get(rel)
+        if s is None:
+            with self.lock:
+                s = self.streams.get(rel)
+                if s is None:
+                    s = self.streams[rel] = Stream(os.path.join(self.root, rel), dtype, self.seg_records, unique_ts)
+        return s
+
+    def _candles(self, symbol, timeframe):
+        return self._stream(os.path.join("candles", _safe(symbol), timeframe), CANDLE, unique_ts=True)
+
+    # ---- writes ----
+    def append_candle(self, symbol, timeframe, bar):
+        self._candles(symbol, timeframe).append([tuple(bar[:6])])
+
+    def append_candles(self, symbol, timeframe, bars):
+        if bars: self._candles(symbol, timeframe).append([tuple(b[:6]) for b in bars])
+
+    def append_candle_arrays(self, symbol, timeframe, ts, ohlcv):
+        """Closed bars straight from CandleStore views (ts int64, ohlcv float64 [n, 5])."""
+        if not len(ts): return
+        a = np.empty(len(ts), dtype=CANDLE); a["ts"] = ts
+        for i, c in enumerate(("open","high","low","close","volume")): a[c] = ohlcv[:, i]
+        self._candles(symbol, timeframe).append(a)
+
+    def append_fill(self, symbol, side, kind, qty, price, pnl=0.0, order_id="", ts=None):
+        self._stream("fills", FILL).append([(ts or _now_ms(), symbol, side, kind, qty, price, pnl, str(order_id or ""))])
+
+    def append_signal(self, symbol, side, why, price, taken, ts=None):
+        self._stream("signals", SIGNAL).append([(ts or _now_ms(), symbol, side or "", price, bool(taken), why[:64])])
+
+    # ---- reads ----
+    def candles(self, symbol, timeframe, start=None, end=None, tail=None):
+        a = self._candles(symbol, timeframe).read(start, end)
+        return a[-tail:] if tail else a
+
+    def candle_rows(self, symbol, timeframe, tail=500):
+        """[[ts, o, h, l, c, v], ...] (CandleStore.load_rows format)."""
+        return [[int(r[0])] + [float(x) for x in tuple(r)[1:]] for r in self.candles(symbol, timeframe, tail=tail)]
+
+    def candles_frame(self, symbol, timeframe, start=None, end=None):
+        import pandas as pd
+        return pd.DataFrame(self.candles(symbol, timeframe, start, end)).rename(columns={"ts": "timestamp"})
+
+    def fills(self, start=None, end=None): return self._stream("fills", FILL).read(start, end)
+
+    def signals(self, start=None, end=None): return self._stream("signals", SIGNAL).read(start, end)
+
+    # ---- maintenance ----
+    def compact_all(self):
+        # open every stream on disk, not only the ones written by this process
+        for dirpath, _, files in os.walk(self.root):
+            if any(_SEG.match(f) for f in files):
+                rel = os.path.relpath(dirpath, self.root)
+                if rel.startswith("candles"): self._stream(rel, CANDLE, unique_ts=True)
+                elif rel == "fills": self._stream(rel, FILL)
+                elif rel == "signals": self._stream(rel, SIGNAL)
+        return {rel: s.compact() for rel, s in list(self.streams.items())}
+
+    def start_compactor(self, interval=600, log=print):
+        def _loop():
+            while True:
+                time.sleep(interval)
+                try: self.compact_all()
+                except Exception as e: log(f"[journal] compaction error: {e}")
+        self._compactor = threading.Thread(target=_loop, daemon=True, name="journal-compactor")
+        self._compactor.start()
@@ -0,0 +1,149 @@
+"""
+ledger.py
+---------
+Positions and realized PnL kept in memory from the bot's own fills, so PnL needs
+no balance request and stays right when the balance moves for other reasons.
+
+    L = Ledger()
+    L.fill(sym, "long", qty, price, fee)       # entry (adds average the entry price)
+    L.mark(sym, last_price)                    # unrealized PnL, no API call
+    L.fill(sym, "short", qty, exit_px, fee)    # reduce/close -> realized PnL of that part
+    with L.order(sym): ...                     # send + book one order; reconcile leaves sym alone meanwhile
+    seen = L.versions(); L.reconcile(exchange_positions, since=seen)   # ccxt fetch_positions, every few minutes
+
+Linear USDT contracts: PnL = qty * (exit - entry) * (+1 long / -1 short), minus
+the entry fees of the closed part and the exit fee. Fill price, quantity and fee
+come from the order response when it has them (`average`, `filled`, `fee.cost`),
+else from what was requested.
+"""
+import time, threading
+from contextlib import contextmanager
+
+def _num(x):
+    try: return float(x) if x is not None else None
+    except (TypeError, ValueError): return None
+
+def fill_of(order, qty, price):
+    """(qty, price, fee) of an order response, falling back to the requested values."""
+    o = order if isinstance(order, dict) else {}
+    fee = o.get("fee") if isinstance(o.get("fee"), dict) else {}
+    return (_num(o.get("filled")) or qty, _num(o.get("average")) or _num(o.get("price")) or price,
+            _num(fee.get("cost")) or 0.0)
+
+def order_id(order):
+    """Exchange id of an order response, or None."""
+    oid = order.get("id") if isinstance(order, dict) else None
+    return str(oid) if oid not in (None, "") else None
+
+class Position:
+    __slots__ = ("symbol", "side", "qty", "entry", "fees", "opened_at", "last_fill", "orders")
+    def __init__(self, symbol, side, qty, entry, fees=0.0, opened_at=None, last_fill=None, orders=()):
+        self.symbol=symbol; self.side=side; self.qty=qty; self.entry=entry; self.fees=fees
+        self.opened_at=opened_at or time.time()
+        self.last_fill=last_fill or self.opened_at   # time of the newest fill booked here
+        self.orders=set(orders)                      # ids of the orders booked into this position
+    @property
+    def sign(self): return 1.0 if self.side == "long" else -1.0
+    def pnl(self, price): return self.qty*(price - self.entry)*self.sign
+
+class Ledger:
+    def __init__(self):
+        self.positions={}
+        self.realized=0.0; self.fees=0.0
+        self.drift=0                 # reconciliations that had to correct the ledger
+        self.pending={}; self.seq={} # per symbol: orders in flight / order starts+ends so far
+        self.lock=threading.Lock()
+
+    def position(self, symbol): return self.positions.get(symbol)
+
+    def fill(self, symbol, side, qty, price, fee=0.0, order_id=None):
+        """Apply a fill; returns the PnL it realized (None if it only opened or added)."""
+        with self.lock:
+            self.fees += fee
+            p = self.positions.get(symbol)
+            if p is None:
+                self.positions[symbol] = Position(symbol, side, qty, price, fee, orders=[order_id] if order_id else ())
+                return None
+            p.last_fill = time.time()
+            if order_id: p.orders.add(order_id)
+            if p.side == side:
+                q = p.qty + qty; p.entry = (p.entry*p.qty + price*qty)/q; p.qty = q; p.fees += fee
+                return None
+            closed = min(qty, p.qty); share = closed/p.qty
+            pnl = p.pnl(price)*share - p.fees*share - fee*closed/qty
+            p.fees -= p.fees*share; p.qty -= closed
+            if p.qty <= 1e-12: del self.positions[symbol]
+            if qty > closed:         # flipped: the rest opens the other side
+                self.positions[symbol] = Position(symbol, side, qty - closed, price, fee*(qty - closed)/qty)
+            self.realized += pnl
+            return pnl
+
+    def close(self, symbol, price, fee=0.0, order_id=None):
+        """Flatten at `price`; returns the realized PnL (None if flat)."""
+        p = self.positions.get(symbol)
+        if p is None: return None
+        return self.fill(symbol, "short" if p.side == "long" else "long", p.qty, price, fee, order_id)
+
+    @contextmanager
+    def order(self, symbol):
+        """Around sending an order and booking its fill: reconcile skips the symbol meanwhile."""
+        with self.lock:
+            self.pending[symbol] = self.pending.get(symbol, 0) + 1; self.seq[symbol] = self.seq.get(symbol, 0) + 1
+        try: yield
+        finally:
+            with self.lock: self.pending[symbol] -= 1; self.seq[symbol] += 1
+
+    def busy(self, symbol): return bool(self.pending.get(symbol))
+
+    def versions(self):
+        """Take before fetching exchange positions; pass to reconcile as `since`."""
+        with self.lock: return dict(self.seq)
+
+    def mark(self, symbol, price):
+        p = self.positions.get(symbol)
+        return p.pnl(price) if p is not None else 0.0
+
+    def reconcile(self, exchange_positions, symbols=None, since=None):
+        """
+        Compare with the exchange (ccxt position dicts). Returns (closed, adopted):
+        symbols the ledger holds but the exchange no longer does (a TP/SL fired; the
+        caller books the exit), and symbols whose size/side were taken from the
+        exchange because the ledger disagreed. Symbols with an order in flight, or
+        one sent since `since` (versions() taken before the fetch), are skipped: the
+        fetched position may predate or postdate a fill the ledger has not booked yet.
+        """
+        seen = {}
+        for x in exchange_positions or ():
+            qty = abs(_num(x.get("contracts")) or 0.0)
+            if qty > 0: seen[x.get("symbol")] = (x.get("side") or "long", qty, _num(x.get("entryPrice")))
+        closed, adopted = [], []
+        with self.lock:
+            for sym in set(self.positions) | set(seen):
+                if symbols is not None and sym not in symbols: continue
+                if self.pending.get(sym) or (since is not None and self.seq.get(sym, 0) != since.get(sym, 0)): continue
+                p = self.positions.get(sym); ex = seen.get(sym)
+                if ex is None:
+                    closed.append(sym); continue
+                side, qty, entry = ex
+                if p is None or p.side != side or abs(p.qty - qty) > 1e-9*max(qty, 1.0):
+                    self.positions[sym] = (Position(sym, side, qty, entry or p.entry, p.fees, p.opened_at, p.last_fill, p.orders)
+                                           if p else Position(sym, side, qty, entry or 0.0))
+                    adopted.append(sym); self.drift += 1
+        return closed, adopted
+
+    def stats(self):
+        with self.lock:
+            return dict(open={s: dict(side=p.side, qty=p.qty, entry=p.entry) for s, p in self.positions.items()},
+                        realized=round(self.realized, 6), fees=round(self.fees, 6), drift=self.drift)
+
+    # warm start
+    def state(self):
+        with self.lock:
+            return dict(positions=[(p.symbol, p.side, p.qty, p.entry, p.fees, p.opened_at, p.last_fill, sorted(p.orders))
+                                   for p in self.positions.values()],
+                        realized=self.realized, fees=self.fees)
+
+    def restore(self, d):
+        with self.lock:
+            self.positions = {r[0]: Position(*r) for r in d.get("positions", ())}
+            self.realized = d.get("realized", 0.0); self.fees = d.get("fees", 0.0)
@@ -0,0 +1,148 @@
+"""
+logbus.py
+---------
+Structured logging that never blocks the caller. `emit()` only puts a tuple on
+a bounded queue; one background thread renders the records and writes each
+batch with a single write + flush.
+
+    LOG.emit("info", "[entry] DOGE/USDT:USDT long", symbol=..., qty=..., price=...)
+    with LOG.bind(tick=42, symbol="DOGE/USDT:USDT"):
+        ...                       # every record from this context carries tick/symbol
+
+Bindings live in a ContextVar: they follow the code into coroutines that
+AsyncCore.run() submits (it runs them in a copy of the caller's context), not
+only records from the same thread.
+
+Backpressure: once the queue is `sample_at` full, debug/info records are sampled
+(one in `sample_every` kept); past `drop_at` they are dropped, which keeps the
+rest of the queue for warn/error. Those are never sampled, only dropped when
+the queue is completely full. Counts go to
+log_sampled_total{level} / log_dropped_total{level}, and the writer reports
+them in a `log_backpressure` record.
+
+    LOG_FORMAT  json (one object per line: ts, level, msg, bound fields, fields) | text (colored on a tty)
+    LOG_LEVEL   debug | info | warn | error      (debug adds one `tick` record with stage timings per tick)
+    LOG_QUEUE   queue capacity (default 10000)
+    LOG_FILE    append here instead of stdout
+"""
+import os, sys, json, time, queue, atexit, threading, contextvars
+from contextlib import contextmanager
+import instrument
+
+LEVELS = dict(debug=10, info=20, warn=30, error=40)
+COLORS = dict(debug="grey", warn="yellow", error="red")
+
+def _iso(t): return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(t)) + f".{int(t % 1 * 1000):03d}Z"
+
+def render_json(rec):
+    t, level, msg, bound, fields = rec
+    d = {"ts": _iso(t), "level": level, "msg": msg}
+    if bound: d.update(bound)
+    if fields: d.update(fields)
+    return json.dumps(d, default=str, ensure_ascii=False)
+
+def render_text(rec, color=False):
+    t, level, msg, bound, fields = rec
+    ctx = " ".join(f"{k}={v}" for k, v in bound.items()) if bound else ""
+    extra = " ".join(f"{k}={v}" for k, v in fields.items()) if fields and "\n" not in msg else ""
+    line = f"{time.strftime('%H:%M:%S', time.gmtime(t))}.{int(t % 1 * 1000):03d} {level.upper():5} " \
+           + (f"({ctx}) " if ctx else "") + msg + (f"  {extra}" if extra else "")
+    if color and level in COLORS:
+        try:
+            from termcolor import colored
+            return colored(line, COLORS[level])
+        except Exception: pass
+    return line
+
+class LogBus:
+    def __init__(self, stream=None, fmt="json", level="info", maxsize=10_000, sample_at=0.5, drop_at=0.9,
+                 sample_every=10, batch=512):
+        self.stream=stream or sys.stdout; self.fmt=fmt
+        self.level=LEVELS[level]; self.batch=batch
+        self.q=queue.Queue(maxsize)
+        self.sample_at=int(maxsize*sample_at); self.drop_at=int(maxsize*drop_at); self.sample_every=sample_every
+        self.color=fmt == "text" and (os.getenv("LOG_COLOR") == "1" or getattr(self.stream, "isatty", lambda: False)())
+        self.dropped={}; self.sampled={}; self._reported=(0, 0); self._seq=0
+        self._fields=contextvars.ContextVar("logbus_fields", default=None)
+        self._thread=None; self._lock=threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        path = os.getenv("LOG_FILE")
+        return cls(open(path, "a", encoding="utf-8") if path else None, os.getenv("LOG_FORMAT", "json"),
+                   os.getenv("LOG_LEVEL", "info"), int(os.getenv("LOG_QUEUE", "10000")))
+
+    def enabled(self, level): return LEVELS[level] >= self.level
+
+    def emit(self, level, msg, **fields):
+        lv = LEVELS[level]
+        if lv < self.level: return
+        if self._thread is None: self._start()
+        if lv < 30:
+            n = self.q.qsize()
+            if n >= self.drop_at: return self._drop(level)
+            if n >= self.sample_at:
+                self._seq += 1
+                if self._seq % self.sample_every:
+                    self.sampled[level] = self.sampled.get(level, 0) + 1
+                    instrument.inc("log_sampled_total", level=level); return
+        try: self.q.put_nowait((time.time(), level, msg, self._fields.get(), fields))
+        except queue.Full: self._drop(level)
+
+    def _drop(self, level):
+        self.dropped[level] = self.dropped.get(level, 0) + 1
+        instrument.inc("log_dropped_total", level=level)
+
+    def debug(self, msg, **fields): self.emit("debug", msg, **fields)
+    def info(self, msg, **fields): self.emit("info", msg, **fields)
+    def warn(self, msg, **fields): self.emit("warn", msg, **fields)
+    def error(self, msg, **fields): self.emit("error", msg, **fields)
+
+    @contextmanager
+    def bind(self, **fields):
+        old = self._fields.get()
+        token = self._fields.set({**old, **fields} if old else fields)   # a new dict: queued records keep theirs
+        try: yield
+        finally: self._fields.reset(token)
+
+    # ---- writer ----
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True, name="logbus")
+                self._thread.start()
+                atexit.register(self.flush, 2.0)
+
+    def _render(self, rec):
+        return render_json(rec) if self.fmt == "json" else render_text(rec, self.color)
+
+    def _backpressure(self):
+        n = (sum(self.dropped.values()), sum(self.sampled.values()))
+        if n == self._reported: return None
+        d, s = n[0] - self._reported[0], n[1] - self._reported[1]; self._reported = n
+        return (time.time(), "warn", "log_backpressure", None, dict(dropped=d, sampled=s))
+
+    def _run(self):
+        while True:
+            batch = [self.q.get()]
+            try:
+                while len(batch) < self.batch: batch.append(self.q.get_nowait())
+            except queue.Empty: pass
+            note = self._backpressure()
+            if note: batch.insert(0, note)
+            out = []
+            for rec in batch:
+                try: out.append(self._render(rec))
+                except Exception as e: out.append(f"[logbus] cannot render {rec[2]!r}: {e}")
+            try:
+                self.stream.write("\n".join(out) + "\n"); self.stream.flush()
+            except Exception: pass
+            for _ in range(len(batch) - (1 if note else 0)): self.q.task_done()
+
+    def flush(self, timeout=None):
+        """Wait until everything queued so far is written (at most `timeout` s)."""
+        if self._thread is None: return
+        end = None if timeout is None else time.monotonic() + timeout
+        while self.q.unfinished_tasks and (end is None or time.monotonic() < end): time.sleep(0.01)
+
+LOG = LogBus.from_env()
@@ -1,12 +1,29 @@
-import os, time, math
-import pandas as pd
+import os, sys, time, math, asyncio, importlib, itertools
+BOOT_T0 = time.perf_counter()                  # startup_seconds{phase} is measured from here
+if __name__ == "__main__":
+    # indicators_dashboard / log_metrics_plus `import main`: reuse this module, don't execute it twice
+    sys.modules.setdefault("main", sys.modules[__name__])
 import numpy as np
-import ccxt
 from flask import Flask, jsonify, request, redirect, render_template_string
-from threading import Thread
+from threading import Thread, Lock
 from datetime import datetime, timezone
 from dotenv import load_dotenv
 from resilience import CircuitBreaker, retry
+import instrument
+from instrument import timed
+from symbol_state import SymbolState, MIRRORED
+from engine_state import EngineState, State, ACCOUNT
+from scheduler import SymbolScheduler
+from ws_feed import MarketFeed, AiohttpTransport
+from async_core import AsyncCore
+from account_cache import TTLCache
+from rate_limit import RateLimiter, Deferred
+from journal import Journal
+from logbus import LOG
+from ledger import Ledger, fill_of, order_id
+from exit_manager import ExitManager
+import warm_start
+from execution import Executor
 
 load_dotenv()
 
@@ -16,148 +33,254 @@ INTERVAL     = "15m"
 MARKET_TYPE  = "swap"
 LEVERAGE     = 10
 RISK_ALLOC   = 0.60
+TP1_ATR, TP2_ATR, SL_ATR, TRAIL_ATR = 1.2, 2.4, 1.2, 1.0        # exit levels in ATRs from the entry
+TP1_FRACTION = 0.5                                               # closed at TP1; the rest trails
 TRADE_MODE   = os.getenv("TRADE_MODE","live")
+SYMBOLS      = [s.strip() for s in os.getenv("SYMBOLS", SYMBOL).split(",") if s.strip()]
+MTF_TIMEFRAMES = [t.strip() for t in os.getenv("MTF_TIMEFRAMES","").split(",") if t.strip()]   # e.g. "1h,4h"
+MAX_OPEN_POSITIONS = int(os.getenv("MAX_OPEN_POSITIONS","1"))   # RISK_ALLOC applies per position
+SCAN_PERIOD  = 10.0
+SCAN_MAX_RPS = float(os.getenv("SCAN_MAX_RPS","5"))            # BingX market data: ~10 req/s per IP
+MARKET_FEED  = os.getenv("MARKET_FEED","rest")                  # "ws": push bars from BingX websocket
+FEED_URL     = os.getenv("FEED_URL","")                         # websocket override (fake_exchange.WSServer)
+FEED_MIN_EVAL = 0.25                                             # s between feed-driven evaluations per symbol
+ASYNC_IO     = os.getenv("ASYNC_IO","1")=="1"                   # exchange I/O through async_core
+RATE_LIMIT_RPS = float(os.getenv("RATE_LIMIT_RPS","10"))        # shared token bucket for all exchange calls
+MARKET_MAX_WAIT = 1.0                                             # s; longer waits defer the symbol instead
+BALANCE_TTL  = float(os.getenv("BALANCE_TTL","30"))             # s; fills/closes invalidate earlier
+JOURNAL_DIR  = os.getenv("JOURNAL_DIR","journal")               # "" disables the trade/candle journal
+SNAPSHOT_PATH = os.getenv("SNAPSHOT_PATH","engine.snapshot")      # "" disables warm-start snapshots
+PROTECTED_ENTRY = os.getenv("PROTECTED_ENTRY","0")=="1"       # TP/SL placed on the exchange before the entry
+SNAPSHOT_EVERY = 30.0                                             # s; entries/exits also write one
+RECONCILE_EVERY = float(os.getenv("RECONCILE_EVERY","300"))     # s between position checks against the exchange
+EXIT_MANAGER = os.getenv("EXIT_MANAGER","1")=="1"               # local TP1/TP2/stop/trailing exits
+EXIT_PERIOD  = 0.25                                               # s; exit levels re-checked at least this often
+ENGINE       = os.getenv("ENGINE","auto")                       # "off": this process only serves HTTP
+ENGINE_LOCK  = os.getenv("ENGINE_LOCK","engine.lock")           # one engine across gunicorn workers; "" disables
 
 # App
 app = Flask(__name__)
-from indicators_dashboard import register_metrics
+from indicators_dashboard import register_metrics, publish as publish_metrics
 register_metrics(app)
 from log_metrics_plus import start_metrics_logger_plus, print_snapshot_plus
 
-# State
-total_trades=successful_trades=failed_trades=0
-compound_profit=0.0
-position_open=False; position_side="N/A"
-entry_price=tp1_price=tp2_price=sl_price=current_pnl=0.0
-current_price=0.0; update_time=""
-rsi_value=adx_value=ema_200_value=current_atr=0.0
-price_range_value=None; bb_width=None; supertrend_dir_value=None
-ema20_value=None; ema50_value=None
-trailing_active=False
-cached_balance=None
+# State: account counters + the displayed symbol, read by other threads through SHARED.view()
+SHARED = EngineState()
 metrics_started=False
-cooldown_until=0.0; cooldown_reason=""
-anti_reentry_until=0.0
-daily_trade_count=0; current_day=None
-CB_ohlcv = CircuitBreaker(5, 60)
-CB_balance = CircuitBreaker(5, 60)
-CB_order = CircuitBreaker(3, 120)
+CB_balance = CircuitBreaker(5, 60, "balance", window=600, min_calls=5, latency_budget=3.0)   # ~1 call per BALANCE_TTL
+BAL_CACHE = TTLCache(BALANCE_TTL)
+RL = RateLimiter(RATE_LIMIT_RPS, burst=RATE_LIMIT_RPS)
+CB_order = CircuitBreaker(3, 120, "order", window=3600, min_calls=3, latency_budget=8.0)     # a few orders an hour
+STATES = [SymbolState(s, INTERVAL, 500, MTF_TIMEFRAMES) for s in SYMBOLS]
+SCHED = SymbolScheduler(STATES, SCAN_PERIOD, SCAN_MAX_RPS)
+JOURNAL = Journal(JOURNAL_DIR) if JOURNAL_DIR else None
+LEDGER = Ledger()   # positions/PnL from our own fills; the exchange is only asked every RECONCILE_EVERY
 
 # Try to load user core AS-IS
 HAVE_CORE=False
 try:
-    import bot_core as CORE
+    CORE = importlib.import_module(os.getenv("BOT_CORE_MODULE","bot_core"))   # fake_exchange: offline simulator
     HAVE_CORE=True
 except Exception:
     CORE=None
 
-def log(m): print(m, flush=True)
+def log(m, level="info", **fields): LOG.emit(level, m, **fields)   # queued; the logbus thread writes
 def keys_missing(): return not (os.getenv("BINGX_API_KEY") and os.getenv("BINGX_API_SECRET"))
-def safe_df(df): return isinstance(df, pd.DataFrame) and len(df)>0
+def safe_df(df): return df is not None and hasattr(df, "columns") and len(df)>0
 def utc_ts(): return time.time()
 def day_key(ts): return datetime.fromtimestamp(ts, tz=timezone.utc).strftime("%Y-%m-%d")
 
 def reset_daily_if_needed():
-    global daily_trade_count, current_day
     d = day_key(utc_ts())
-    if current_day is None or d != current_day:
-        daily_trade_count = 0; current_day = d; log(f"[daily] reset for {d}")
+    if d != SHARED.view().current_day:
+        SHARED.publish(daily_trade_count=0, current_day=d); log(f"[daily] reset for {d}")
+
+def __getattr__(name):
+    # main.total_trades etc. for scripts written against the old globals; one field per
+    # call, so read several through SHARED.view() to get them from the same version
+    if name in State.__slots__: return getattr(SHARED.view(), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Fallback exchange if needed
-def _build_ex():
-    return ccxt.bingx({
+def _ex_config():
+    return {
         'apiKey': os.getenv("BINGX_API_KEY",""),
         'secret': os.getenv("BINGX_API_SECRET",""),
-        'enableRateLimit': True,
+        'enableRateLimit': False,   # RL (rate_limit.py) paces every call, with priorities
         'options': {'defaultType': MARKET_TYPE, 'defaultMarginMode':'isolated'},
-    })
-exchange = _build_ex()
+    }
+_EXCHANGE = None
+def exchange():
+    # blocking client, built on first use: importing ccxt costs ~0.5s of every cold start
+    global _EXCHANGE
+    if _EXCHANGE is None:
+        import ccxt
+        _EXCHANGE = ccxt.bingx(_ex_config())
+    return _EXCHANGE
+AIO = AsyncCore(_ex_config(), CORE if HAVE_CORE else None) if ASYNC_IO else None   # loop thread starts on first call
+_LEVERAGE_SET = set()
+_EXEC = None
+def executor():
+    global _EXEC
+    if _EXEC is None: _EXEC = Executor(RL.wrap(AIO.blocking() if AIO is not None else CORE if HAVE_CORE else exchange()))
+    return _EXEC
 
 # ---- Core adapters (no modification to user's functions) ----
-@retry(tries=3, delay=0.5, backoff=2.0)
-def core_fetch_ohlcv(symbol, timeframe, limit=500):
+# Market data is not retried in place: a failure or a rate-limit deferral re-queues
+# the symbol through SCHED; balance and orders retry, ahead of market data in RL.
+@RL.limit("fetch_ohlcv", max_wait=MARKET_MAX_WAIT)
+def core_fetch_ohlcv(symbol, timeframe, limit=500, since=None):
+    # user core has no `since`; a small `limit` still returns the latest bars
     if HAVE_CORE and hasattr(CORE,'fetch_ohlcv'): return CORE.fetch_ohlcv(symbol, timeframe, limit)
-    return exchange.fetch_ohlcv(symbol, timeframe=timeframe, limit=limit)
+    return exchange().fetch_ohlcv(symbol, timeframe=timeframe, since=since, limit=limit)
 
-@retry(tries=3, delay=0.5, backoff=2.0)
+@retry(tries=3, delay=0.5, backoff=2.0, deadline=4.0)
+@RL.limit("fetch_balance")
 def core_fetch_balance():
     if HAVE_CORE and hasattr(CORE,'fetch_balance'): return CORE.fetch_balance({'type':'swap'})
-    return exchange.fetch_balance(params={'type':'swap'})
+    return exchange().fetch_balance(params={'type':'swap'})
+
+@RL.limit("fetch_ohlcv", max_wait=MARKET_MAX_WAIT)
+async def acore_fetch_ohlcv(symbol, timeframe, limit=500, since=None):
+    return await AIO.fetch_ohlcv(symbol, timeframe, limit, since)
 
-@retry(tries=2, delay=0.5, backoff=2.0)
-def core_create_order(symbol, side, amount, price=None):
+@retry(tries=3, delay=0.5, backoff=2.0, deadline=4.0, timeout=3.0)
+@RL.limit("fetch_balance")
+async def acore_fetch_balance():
+    return await AIO.fetch_balance()
+
+@timed("create_order")
+@retry(tries=2, delay=0.5, backoff=2.0, deadline=5.0)
+@RL.limit("create_order")
+def core_create_order(symbol, side, amount, price=None, reduce_only=False):
+    if AIO is not None: return AIO.run(AIO.create_order(symbol, side, amount, price, reduce_only))
     if HAVE_CORE and hasattr(CORE,'create_order'):
-        return CORE.create_order(symbol=symbol, type='market', side='buy' if side=='long' else 'sell', amount=amount, params={'reduceOnly': False})
-    return exchange.create_order(symbol, type='market', side='buy' if side=='long' else 'sell', amount=amount, params={'reduceOnly': False})
+        return CORE.create_order(symbol=symbol, type='market', side='buy' if side=='long' else 'sell', amount=amount, params={'reduceOnly': reduce_only})
+    return exchange().create_order(symbol, type='market', side='buy' if side=='long' else 'sell', amount=amount, params={'reduceOnly': reduce_only})
+
+@retry(tries=2, delay=0.5, backoff=2.0, deadline=4.0)
+@RL.limit("fetch_positions")
+def core_fetch_positions(symbols):
+    if AIO is not None: return AIO.run(AIO.call("fetch_positions", symbols))
+    if HAVE_CORE and hasattr(CORE,'fetch_positions'): return CORE.fetch_positions(symbols)
+    return exchange().fetch_positions(symbols)
 
-def core_set_leverage(leverage):
+@retry(tries=2, delay=0.5, backoff=2.0, deadline=4.0)
+@RL.limit("fetch_my_trades")
+def core_fetch_my_trades(symbol, since=None):
+    if AIO is not None: return AIO.run(AIO.call("fetch_my_trades", symbol, since))
+    if HAVE_CORE and hasattr(CORE,'fetch_my_trades'): return CORE.fetch_my_trades(symbol, since)
+    return exchange().fetch_my_trades(symbol, since)
+
+def core_set_leverage(leverage, symbol=SYMBOL):
+    # leverage is sticky on the exchange: one round-trip per symbol, not per order
+    if (symbol, leverage) in _LEVERAGE_SET: return None
     try:
-        if HAVE_CORE and hasattr(CORE,'set_leverage'): return CORE.set_leverage(leverage, SYMBOL, params={'marginMode':'isolated'})
-        return exchange.set_leverage(leverage, SYMBOL, params={'marginMode':'isolated'})
+        RL.acquire("set_leverage")
+        if AIO is not None: r = AIO.run(AIO.set_leverage(leverage, symbol))
+        elif HAVE_CORE and hasattr(CORE,'set_leverage'): r = CORE.set_leverage(leverage, symbol, params={'marginMode':'isolated'})
+        else: r = exchange().set_leverage(leverage, symbol, params={'marginMode':'isolated'})
+        _LEVERAGE_SET.add((symbol, leverage)); return r
     except Exception as e:
-        log(f"leverage warn: {e}")
+        log(f"leverage warn: {e}", "warn")
 
 # ---- Data / Indicators ----
-def get_klines():
+@timed("get_klines")
+def get_klines(st):
+    """Refresh the symbol's candle window; False when no data is available."""
+    try:
+        if not st.cb_ohlcv.allow(): return False
+        t0 = time.perf_counter()
+        st.store.refresh(core_fetch_ohlcv)
+        st.cb_ohlcv.on_success(time.perf_counter()-t0)
+        return len(st.store)>0
+    except Deferred:
+        st.cb_ohlcv.release(); raise
+    except Exception as e:
+        st.cb_ohlcv.on_failure(time.perf_counter()-t0)
+        log(f"[{st.symbol}] get_klines error: {e}", "error")
+        return False
+
+@timed("get_klines")
+async def aget_klines(st):
     try:
-        if not CB_ohlcv.allow(): 
-            time.sleep(2); return pd.DataFrame()
-        ohlcv = core_fetch_ohlcv(SYMBOL, INTERVAL, 500)
-        CB_ohlcv.on_success()
-        df = pd.DataFrame(ohlcv, columns=["timestamp","open","high","low","close","volume"])
-        df["timestamp"] = pd.to_datetime(df["timestamp"], unit="ms")
-        for c in ["open","high","low","close","volume"]:
-            df[c] = pd.to_numeric(df[c], errors="coerce")
-        return df.dropna().reset_index(drop=True)
+        if not st.cb_ohlcv.allow(): return False
+        t0 = time.perf_counter()
+        await AIO.refresh_store(st.store, acore_fetch_ohlcv)
+        st.cb_ohlcv.on_success(time.perf_counter()-t0)
+        return len(st.store)>0
+    except Deferred:
+        st.cb_ohlcv.release(); raise
     except Exception as e:
-        CB_ohlcv.on_failure()
-        log(f"get_klines error: {e}")
-        return pd.DataFrame()
-
-def compute_indicators(df: pd.DataFrame):
-    global rsi_value, adx_value, ema_200_value, current_atr, current_price
-    global price_range_value, supertrend_dir_value, ema20_value, ema50_value, update_time, bb_width
-    import ta
-    close=df["close"]; high=df["high"]; low=df["low"]
-    rsi=ta.momentum.RSIIndicator(close=close, window=14).rsi(); rsi_value=float(rsi.iloc[-2]) if len(rsi)>=2 else 0.0
-    adx=ta.trend.ADXIndicator(high=high, low=low, close=close, window=14).adx(); adx_value=float(adx.iloc[-1]) if len(adx) else 0.0
-    ema200=ta.trend.EMAIndicator(close=close, window=200).ema_indicator(); ema_200_value=float(ema200.iloc[-1]) if len(ema200) else 0.0
-    ema20=ta.trend.EMAIndicator(close=close, window=20).ema_indicator(); ema50=ta.trend.EMAIndicator(close=close, window=50).ema_indicator()
-    ema20_value=float(ema20.iloc[-1]) if len(ema20) else None; ema50_value=float(ema50.iloc[-1]) if len(ema50) else None
-    atr=ta.volatility.AverageTrueRange(high=high, low=low, close=close, window=14).average_true_range(); current_atr=float(atr.iloc[-1]) if len(atr) else 0.0
-    # BB width %
-    bb = ta.volatility.BollingerBands(close=close, window=20, window_dev=2)
-    bb_width = float(((bb.bollinger_hband() - bb.bollinger_lband()) / close).iloc[-1]*100.0)
-    current_price=float(close.iloc[-1])
-    price_range_value=float((high.iloc[-1]-low.iloc[-1]) / max(low.iloc[-1],1e-9) * 100.0)
-    supertrend_dir_value= 1 if close.iloc[-1] > ema200.iloc[-1] else -1
-    update_time=datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S UTC")
-    get_balance()
-
-def spike_filter(df: pd.DataFrame)->bool:
-    last = df.tail(1).iloc[0]
-    body = abs(last['close']-last['open'])
-    wick = (last['high']-last['low'])
+        st.cb_ohlcv.on_failure(time.perf_counter()-t0)
+        log(f"[{st.symbol}] get_klines error: {e}", "error")
+        return False
+
+@timed("compute_indicators")
+def compute_indicators(st):
+    # incremental: only bars at/after the forming one are applied (see indicators_stream)
+    st.ind.sync(st.store.ts, st.store.ohlcv)
+    for r in st.htf.values(): r.sync(st.store.ts, st.store.ohlcv)
+    v=st.ind.values; ts,o,high,low,close,vol=st.ind.forming
+    st.rsi_value=float(v['rsi_prev']); st.adx_value=float(v['adx']); st.ema_200_value=float(v['ema200'])
+    st.ema20_value=float(v['ema20']); st.ema50_value=float(v['ema50']); st.current_atr=float(v['atr'])
+    st.bb_width=float(v['bb_width'])
+    st.current_price=float(close)
+    st.price_range_value=float((high-low) / max(low,1e-9) * 100.0)
+    st.supertrend_dir_value= 1 if close > st.ema_200_value else -1
+    st.update_time=datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S UTC")
+
+def spike_filter(bar)->bool:
+    o,h,l,c,v = bar
+    body = abs(c-o)
+    wick = (h-l)
     return wick > 4*max(body, 1e-9)
 
-def explosion_filter()->bool:
-    if price_range_value and price_range_value > 3.0: return True
-    if bb_width and bb_width > 3.5: return True
+def explosion_filter(st)->bool:
+    if st.price_range_value and st.price_range_value > 3.0: return True
+    if st.bb_width and st.bb_width > 3.5: return True
     return False
 
 # ---- Balance & sizing ----
+def _apply_balance(bal):
+    total=None
+    if isinstance(bal, dict) and 'USDT' in bal.get('total', {}): total=float(bal['total']['USDT'])
+    SHARED.publish(cached_balance=total); return BAL_CACHE.put(total)
+
 def get_balance():
-    global cached_balance
+    hit, bal = BAL_CACHE.lookup()
+    if hit: return bal
     try:
-        if not CB_balance.allow(): return cached_balance
+        if not CB_balance.allow(): return BAL_CACHE.stale()
+        t0 = time.perf_counter()
         bal = core_fetch_balance()
-        CB_balance.on_success()
-        total=None
-        if isinstance(bal, dict) and 'USDT' in bal.get('total', {}): total=float(bal['total']['USDT'])
-        cached_balance=total; return total
+        CB_balance.on_success(time.perf_counter()-t0)
+        return _apply_balance(bal)
+    except Exception as e:
+        CB_balance.on_failure(time.perf_counter()-t0)
+        log(f"balance error: {e}", "error"); return BAL_CACHE.stale()
+
+async def aget_balance():
+    hit, bal = BAL_CACHE.lookup()
+    if hit: return bal
+    try:
+        if not CB_balance.allow(): return BAL_CACHE.stale()
+        t0 = time.perf_counter()
+        bal = await acore_fetch_balance()
+        CB_balance.on_success(time.perf_counter()-t0)
+        return _apply_balance(bal)
     except Exception as e:
-        CB_balance.on_failure()
-        log(f"balance error: {e}"); return cached_balance
+        CB_balance.on_failure(time.perf_counter()-t0)
+        log(f"balance error: {e}", "error"); return BAL_CACHE.stale()
+
+def rate_limit_stats(): return RL.stats()
+
+def breaker_stats():
+    return dict(balance=CB_balance.stats(), order=CB_order.stats(), **{f"ohlcv:{st.symbol}": st.cb_ohlcv.stats() for st in STATES})
+
+def balance_cache_stats(): return BAL_CACHE.stats()
+
+def ledger_stats(): return LEDGER.stats()
 
 def calc_qty(price: float):
     bal = get_balance() or 0.0
@@ -165,79 +288,390 @@ def calc_qty(price: float):
     return max(nominal / max(price,1e-9), 0.0)
 
 # ---- Signals (entry/exit are authorizable; SL/TP handled by your core if it supports it) ----
-def signal(df: pd.DataFrame):
-    if adx_value < 15: return None, "adx_low"
-    if spike_filter(df): return None, "spike"
-    if explosion_filter(): return None, "explosion"
-    if ema20_value is None or ema50_value is None: return None, "no_ema"
-    trend = "long" if supertrend_dir_value>0 else "short"
-    if trend=="long" and ema20_value>ema50_value and rsi_value<70:
+@timed("signal")
+def signal(st):
+    if st.adx_value < 15: return None, "adx_low"
+    if spike_filter(st.store.ohlcv[-1]): return None, "spike"
+    if explosion_filter(st): return None, "explosion"
+    if st.ema20_value is None or st.ema50_value is None: return None, "no_ema"
+    trend = "long" if st.supertrend_dir_value>0 else "short"
+    for tf, r in st.htf.items():   # higher timeframes must not point the other way (0 = warming up)
+        if r.trend() == (-1 if trend=="long" else 1): return None, f"htf_{tf}_against"
+    if trend=="long" and st.ema20_value>st.ema50_value and st.rsi_value<70:
         return "long", "ema20>ema50 & rsi<70 & uptrend"
-    if trend=="short" and ema20_value<ema50_value and rsi_value>30:
+    if trend=="short" and st.ema20_value<st.ema50_value and st.rsi_value>30:
         return "short", "ema20<ema50 & rsi>30 & downtrend"
     return None, "no_setup"
 
 # ---- Orders ----
-def place_order(side: str, qty: float, price: float):
-    global total_trades, position_open, position_side, entry_price
+def open_positions(): return sum(1 for st in STATES if st.position_open)
+
+# Held from the MAX_OPEN_POSITIONS check through place_order: the main loop and the websocket
+# feed evaluate different symbols at once, each under only its own st.lock.
+ENTRY_LOCK = Lock()
+
+def place_order(st, side: str, qty: float, price: float):
     if qty <= 0:
-        log("qty<=0"); return None
+        log("qty<=0", "warn"); return None
     if not CB_order.allow():
-        log("[circuit] orders blocked temporarily"); return None
+        log("[circuit] orders blocked temporarily", "warn"); return None
+    t0 = time.perf_counter()
     try:
-        core_set_leverage(LEVERAGE)
-        core_create_order(SYMBOL, side, qty, price)
-        total_trades += 1; position_open=True; position_side=side; entry_price=price
-        log(f"[entry] {side} qty={qty:.4f} @≈{price:.6f}")
-        CB_order.on_success()
-        return True
+        with LEDGER.order(st.symbol):   # sent and booked: reconcile leaves the symbol alone
+            core_set_leverage(LEVERAGE, st.symbol)
+            if PROTECTED_ENTRY:
+                # with the exit manager these are the safety net: TP at TP2, partial exits are local
+                tp_atr = TP2_ATR if EXITS else TP1_ATR
+                tp = price + tp_atr*st.current_atr if side=="long" else price - tp_atr*st.current_atr
+                sl = price - SL_ATR*st.current_atr if side=="long" else price + SL_ATR*st.current_atr
+                r = executor().enter_protected(st.symbol, side, qty, tp, sl)
+                log(f"[exec] {st.symbol} " + " ".join(f"{k}={v*1000:.0f}ms" for k, v in r.timings.items())
+                    + (" (batch)" if r.batched else ""), ms={k: round(v*1000, 3) for k, v in r.timings.items()}, batched=r.batched)
+                if not r.ok: raise RuntimeError(r.info)
+                st.tp1_price=tp; st.sl_price=sl; st.protection=(tp, sl, st.store.last_ts()); order = r.order
+            else:
+                order = core_create_order(st.symbol, side, qty, price)
+            qty, price, fee = fill_of(order, qty, price)
+            LEDGER.fill(st.symbol, side, qty, price, fee, order_id(order))
+            pos = LEDGER.position(st.symbol)
+            st.position_open=True; st.position_side=pos.side; st.entry_price=pos.entry; st.qty=pos.qty
+            if EXITS: _track(st)
+            with SHARED.edit() as s: s.total_trades += 1
+            log(f"[entry] {st.symbol} {side} qty={qty:.4f} @{price:.6f} fee={fee:.4f}",
+                event="entry", symbol=st.symbol, side=side, qty=qty, price=price, fee=fee)
+            CB_order.on_success(time.perf_counter()-t0); BAL_CACHE.invalidate()
+            if JOURNAL: JOURNAL.append_fill(st.symbol, side, "entry", qty, price, order_id=order_id(order) or "")
+            request_snapshot()
+            return True
     except Exception as e:
-        CB_order.on_failure()
-        log(f"order error: {e}")
+        CB_order.on_failure(time.perf_counter()-t0)
+        log(f"order error: {e}", "error", symbol=st.symbol)
         return None
 
-def update_pnl():
-    global current_pnl
-    if not position_open: current_pnl=0.0; return
-    bal = get_balance() or 0.0
-    nominal = bal * RISK_ALLOC * LEVERAGE
-    delta = (current_price - entry_price) if position_side=="long" else (entry_price - current_price)
-    current_pnl = nominal * (delta / max(entry_price,1e-9))
+def update_pnl(st):
+    # mark-to-market from the ledger: no balance request
+    st.current_pnl = LEDGER.mark(st.symbol, st.current_price) if st.position_open else 0.0
+    p = EXITS.plan(st.symbol) if EXITS else None
+    if p is not None:
+        EXITS.on_price(st.symbol, st.current_price)
+        st.sl_price=p.stop; st.trailing_active=p.trailing
+
+def reduce_position(st, qty, price, order=None, kind="partial"):
+    """Book a partial exit; the trade counts as a win/loss once it is closed."""
+    qty, price, fee = fill_of(order, qty, price)
+    pnl = LEDGER.fill(st.symbol, "short" if st.position_side=="long" else "long", qty, price, fee, order_id(order)) or 0.0
+    pos = LEDGER.position(st.symbol)
+    st.qty = pos.qty if pos else 0.0; st.trade_pnl += pnl
+    with SHARED.edit() as s: s.compound_profit += pnl
+    log(f"[{kind}] {st.symbol} {st.position_side} qty={qty:.4f} @{price:.6f} pnl={pnl:+.4f}",
+        event=kind, symbol=st.symbol, side=st.position_side, qty=qty, price=price, pnl=pnl)
+    if JOURNAL: JOURNAL.append_fill(st.symbol, st.position_side, kind, qty, price, pnl, order_id(order) or "")
+    BAL_CACHE.invalidate(); request_snapshot()
+
+def close_position(st, price=None, order=None, kind="exit"):
+    """Book the exit (the order itself is the caller's): realized PnL, wins/losses, journal."""
+    if st.position_open:
+        qty, price, fee = fill_of(order, st.qty, price or st.current_price)
+        pnl = LEDGER.close(st.symbol, price, fee, order_id(order)) or 0.0
+        trade = st.trade_pnl + pnl                      # including partial exits
+        with SHARED.edit() as s:
+            s.compound_profit += pnl
+            if trade > 0: s.successful_trades += 1
+            else: s.failed_trades += 1
+        log(f"[{kind}] {st.symbol} {st.position_side} qty={qty:.4f} @{price:.6f} pnl={pnl:+.4f} trade={trade:+.4f}",
+            event=kind, symbol=st.symbol, side=st.position_side, qty=qty, price=price, pnl=pnl, trade_pnl=trade)
+        if JOURNAL: JOURNAL.append_fill(st.symbol, st.position_side, kind, qty, price, pnl, order_id(order) or "")
+    if EXITS: EXITS.untrack(st.symbol)
+    st.close(); BAL_CACHE.invalidate()
+    request_snapshot()
+
+# ---- Exits: levels checked locally on every price, orders only on a crossing ----
+def _track(st):
+    p = EXITS.track(st.symbol, st.position_side, st.qty, st.entry_price, st.current_atr)
+    st.tp1_price=p.tp1; st.tp2_price=p.tp2; st.sl_price=p.stop; st.trailing_active=False
+
+def _last_price(symbol):
+    # freshest price we hold: the forming bar's close, moved by every websocket push and REST refresh
+    store = BY_SYMBOL[symbol].store
+    return float(store.ohlcv[-1, 3]) if len(store) else 0.0
+
+def execute_exit(plan, reason, qty, price):
+    """ExitManager callback (its worker thread): reduce-only market order, then book it."""
+    st = BY_SYMBOL[plan.symbol]
+    if not CB_order.allow(): return False
+    with LEDGER.order(st.symbol):   # sent and booked: reconcile leaves the symbol alone
+        t0 = time.perf_counter()
+        try:
+            order = core_create_order(st.symbol, "short" if plan.side=="long" else "long", qty, reduce_only=True)
+            CB_order.on_success(time.perf_counter()-t0)
+        except Exception as e:
+            CB_order.on_failure(time.perf_counter()-t0)
+            log(f"[exit] {st.symbol} {reason} order error: {e}", "error"); return False
+        with st.lock, LOG.bind(symbol=st.symbol, trigger=price, level_stop=plan.stop):
+            if not st.position_open: return True
+            if reason == "tp1": reduce_position(st, qty, price, order, "tp1")
+            else:
+                if PROTECTED_ENTRY: executor().cancel_all(st.symbol)   # exchange-side TP/SL of a flat position
+                close_position(st, price, order, reason)
+            _mirror(st)
+    return True
+
+def exit_stats(): return EXITS.stats() if EXITS else {}
+
+def _exchange_exit(st):
+    """
+    (price, fill) of a close the exchange made on its own; fill from its trade history when it has it.
+    Only closing-side trades after the last fill the ledger booked and not from our own orders
+    (a TP1 partial is already booked), newest first up to the quantity still open.
+    """
+    pos = LEDGER.position(st.symbol)
+    since = int(pos.last_fill*1000) if pos else None
+    side = "sell" if st.position_side == "long" else "buy"
+    try:
+        trades = [t for t in core_fetch_my_trades(st.symbol, since) or ()
+                  if t.get("side") == side and (since is None or (t.get("timestamp") or 0) >= since)
+                  and not (pos and str(t.get("order")) in pos.orders)]
+        left = pos.qty if pos else st.qty; fills = []
+        for t in sorted(trades, key=lambda t: t.get("timestamp") or 0, reverse=True):
+            if left <= 1e-12: break
+            q = min(float(t["amount"]), left); left -= q
+            fee = float((t.get("fee") or {}).get("cost") or 0.0)*q/float(t["amount"])
+            fills.append((q, float(t["price"]), fee))
+        qty = sum(q for q, _, _ in fills)
+        if qty > 0:
+            px = sum(q*x for q, x, _ in fills)/qty
+            return px, dict(filled=qty, average=px, fee=dict(cost=sum(f for _, _, f in fills)))
+    except Exception as e: log(f"[reconcile] {st.symbol} trade history unavailable: {e}", "warn")
+    return _exchange_exit_price(st), None
+
+def _exchange_exit_price(st):
+    # the exchange closed it (its TP/SL fired between checks): the first of the two
+    # levels the candles since the entry bar touched; both in one bar counts as the stop
+    if not st.protection: return st.current_price
+    tp, sl, since = st.protection; long = st.position_side == "long"
+    i = int(np.searchsorted(st.store.ts, since, "left"))
+    hi, lo = st.store.col("high")[i:], st.store.col("low")[i:]
+    hit_tp = hi >= tp if long else lo <= tp
+    hit_sl = lo <= sl if long else hi >= sl
+    first = np.flatnonzero(hit_tp | hit_sl)
+    if not len(first): return st.current_price
+    return sl if hit_sl[first[0]] else tp
+
+def reconcile():
+    """Ledger vs exchange positions; runs every RECONCILE_EVERY from the main loop."""
+    # symbols with an order sent or booked around the fetch are skipped: the next check gets them
+    seen = LEDGER.versions()
+    try: closed, adopted = LEDGER.reconcile(core_fetch_positions(SYMBOLS), set(SYMBOLS), seen)
+    except Exception as e:
+        log(f"[reconcile] error: {e}", "error"); return
+    for sym in closed:
+        st = BY_SYMBOL[sym]
+        with st.lock:   # no price yet (just restarted): left for the next check
+            if st.position_open and st.current_price and not LEDGER.busy(sym): close_position(st, *_exchange_exit(st))
+            _mirror(st)
+    for sym in adopted:
+        st = BY_SYMBOL[sym]; p = LEDGER.position(sym)
+        with st.lock:
+            log(f"[reconcile] {sym}: ledger {st.position_side} {st.qty:.4f} -> exchange {p.side} {p.qty:.4f} @{p.entry:.6f}", "warn")
+            st.position_open=True; st.position_side=p.side; st.qty=p.qty; st.entry_price=p.entry
+            plan = EXITS.plan(sym) if EXITS else None
+            if plan is not None and plan.side == p.side: plan.qty = p.qty
+            elif EXITS and st.current_atr: _track(st)
+            _mirror(st)
+        request_snapshot()
 
-def close_position():
-    global position_open, position_side, entry_price, tp1_price, tp2_price, sl_price, current_pnl, trailing_active
-    position_open=False; position_side="N/A"; entry_price=tp1_price=tp2_price=sl_price=current_pnl=0.0; trailing_active=False
+
+def _archive_closed(st):
+    # every bar older than the forming one is closed; journal the ones not written yet
+    ts = st.store.ts; i = int(np.searchsorted(ts, st.archived_ts, "right"))
+    if i < len(ts) - 1:
+        JOURNAL.append_candle_arrays(st.symbol, st.timeframe, ts[i:-1], st.store.ohlcv[i:-1])
+        st.archived_ts = int(ts[-2])
+
+SEEN = {}   # symbol -> (MIRRORED values, summary) as last read under that symbol's lock
+
+def _mirror(*changed):
+    """
+    Publish the given SymbolStates (caller holds their locks) as one new SHARED version.
+    Web threads read only SHARED: dashboard/logger show the symbol in a position, else the first one.
+    """
+    with SHARED.edit() as s:
+        for st in changed: SEEN[st.symbol] = (tuple(getattr(st, k) for k in MIRRORED), st.summary())
+        rows = [SEEN[x.symbol] for x in STATES if x.symbol in SEEN]
+        vals, head = next((r for r in rows if r[1]["position_open"]), rows[0])
+        for k, v in zip(MIRRORED, vals): setattr(s, k, v)
+        s.symbol = head["symbol"]; s.symbols = tuple(r[1] for r in rows)
+    publish_metrics(sys.modules[__name__])
 
 # ---- Main loop with watchdog/backoff ----
+def evaluate(st):
+    """Indicators + entry/PnL for one symbol; caller holds st.lock."""
+    compute_indicators(st)
+    if JOURNAL: _archive_closed(st)
+    price = st.current_price
+    if not st.position_open:
+        sig, why = signal(st)
+        if sig:
+            taken = False
+            with ENTRY_LOCK:
+                if open_positions() < MAX_OPEN_POSITIONS:
+                    qty = calc_qty(price)
+                    taken = bool(place_order(st, sig, qty, price))
+                    log(f"[{st.symbol}] signal={sig} reason={why} qty={qty:.4f}", event="signal", side=sig, reason=why, taken=taken)
+            # journaled when it appears or is taken, not on every evaluation while it stands
+            if JOURNAL and (taken or sig != st.last_signal): JOURNAL.append_signal(st.symbol, sig, why, price, taken)
+        st.last_signal = sig
+    else:
+        st.last_signal = None
+        update_pnl(st)
+    _mirror(st)
+
+async def _tick_io(st, need_bal, need_rest):
+    """Balance and candles for one tick, concurrently."""
+    jobs = ([aget_balance()] if need_bal else []) + ([aget_klines(st)] if need_rest else [])
+    res = await asyncio.gather(*jobs)
+    return res[-1] if need_rest else True
+
+_TICK_IDS = itertools.count(1)
+
+@timed("tick")
+def tick(st):
+    """One scan of one symbol. Returns the delay until it is due again (None = regular period)."""
+    with LOG.bind(tick=next(_TICK_IDS), symbol=st.symbol):
+        with instrument.trace() as stages: delay = _tick(st)
+        if LOG.enabled("debug"):
+            LOG.debug("tick", delay=delay, ms={k: round(v*1000, 3) for k, v in stages.items()})
+    return delay
+
+def _tick(st):
+    reset_daily_if_needed()
+    need_bal = not st.position_open and not BAL_CACHE.fresh()   # only sizing needs it; prefetched with the candles
+    with st.lock:
+        need_rest = st.needs_rest or not len(st.store) or FEED is None or not FEED.healthy(st.symbol)
+        try:
+            if AIO is not None:
+                with instrument.timer("tick_io"): ok = AIO.run(_tick_io(st, need_bal, need_rest))
+            else:
+                if need_bal: get_balance()
+                ok = get_klines(st) if need_rest else True
+        except Deferred as e:
+            return e.wait                             # rate limited: come back when tokens are there
+        if not ok:
+            log(f"[{st.symbol}] No market data, retry", "warn")
+            delay=st.backoff; st.backoff=min(st.backoff*2,60); return delay
+        if need_rest: st.needs_rest=False
+        st.backoff=5
+        evaluate(st)
+    return None
+
+@timed("feed_update")
+def on_feed_bars(symbol, bars):
+    st = BY_SYMBOL[symbol]
+    with st.lock:
+        if not len(st.store): return                  # REST fills the window first
+        if bars[0][0] > st.store.last_ts() + st.store.tf_ms:
+            st.needs_rest=True; return                # missed bars while disconnected
+        st.store.merge(bars)
+        now = time.monotonic()
+        if EXITS and st.position_open: EXITS.on_price(symbol, float(bars[-1][4]))   # every push, not throttled
+        if now - st.last_eval < FEED_MIN_EVAL: return
+        st.last_eval = now
+        try: evaluate(st)
+        except Exception as e: log(f"[ws] {symbol} evaluate error: {e}", "error")
+
+BY_SYMBOL = {st.symbol: st for st in STATES}
+EXITS = ExitManager(execute_exit, _last_price, TP1_ATR, TP2_ATR, SL_ATR, TRAIL_ATR, TP1_FRACTION,
+                    EXIT_PERIOD, log=lambda m: log(m, "error")) if EXIT_MANAGER else None
+
+def warm_from_journal():
+    # closed candles from the previous run: the first REST fetch is then incremental
+    for st in STATES:
+        try:
+            # higher timeframes warm from a longer history than the window holds
+            tail = max([st.store.size] + [250*r.ratio for r in st.htf.values()])
+            a = JOURNAL.candles(st.symbol, st.timeframe, tail=tail)
+            ts, px = a["ts"], np.column_stack([a[c] for c in st.store.COLUMNS])
+            st.store.load(ts, px)
+            for r in st.htf.values(): r.sync(ts, px)
+            st.archived_ts = st.store.last_ts() or 0
+        except Exception as e: log(f"[journal] {st.symbol} warm load failed: {e}", "warn")
+
+FEED = MarketFeed(SYMBOLS, INTERVAL, on_feed_bars, log=log,
+                  transport_factory=(lambda: AiohttpTransport(FEED_URL)) if FEED_URL else AiohttpTransport) if MARKET_FEED=="ws" else None
+
+# ---- Warm start ----
+_last_snapshot = 0.0
+_snapshot_due = False
+
+def request_snapshot():
+    # entries/exits run under st.lock; the main loop writes the snapshot right after the tick
+    global _snapshot_due
+    _snapshot_due = True
+
+def save_snapshot():
+    """Takes every state's lock: never call it while holding one."""
+    global _last_snapshot, _snapshot_due
+    _snapshot_due = False
+    if not SNAPSHOT_PATH: return
+    try:
+        states = {}
+        for st in STATES:
+            with st.lock: states[st.symbol] = warm_start.capture_symbol(st)
+        warm_start.save(SNAPSHOT_PATH, dict(
+            interval=INTERVAL, states=states, account={k: getattr(SHARED.view(), k) for k in ACCOUNT},
+            leverage_set=sorted(_LEVERAGE_SET), ledger=LEDGER.state(), exits=EXITS.state() if EXITS else {},
+            breakers={n: warm_start.breaker_state(cb) for n, cb in (("balance", CB_balance), ("order", CB_order))}))
+        _last_snapshot = time.monotonic()
+    except Exception as e: log(f"[snapshot] save error: {e}", "error")
+
+def load_snapshot():
+    snap = warm_start.load(SNAPSHOT_PATH) if SNAPSHOT_PATH else None
+    if not snap or snap.get("interval") != INTERVAL: return False
+    SHARED.publish(**{k: v for k, v in snap["account"].items() if k in ACCOUNT})
+    _LEVERAGE_SET.update(tuple(x) for x in snap["leverage_set"])
+    LEDGER.restore(snap["ledger"])
+    if EXITS: EXITS.restore(snap["exits"])
+    warm_start.restore_breaker(CB_balance, snap["breakers"]["balance"])
+    warm_start.restore_breaker(CB_order, snap["breakers"]["order"])
+    for st in STATES:
+        if st.symbol in snap["states"]: warm_start.restore_symbol(st, snap["states"][st.symbol])
+        if EXITS and st.position_open and EXITS.plan(st.symbol) is None and st.current_atr: _track(st)
+    if SHARED.view().cached_balance is not None: BAL_CACHE.put(SHARED.view().cached_balance)
+    held = [f"{st.symbol}:{st.position_side}" for st in STATES if st.position_open]
+    log(f"[snapshot] warm start from {datetime.fromtimestamp(snap['saved_at'], tz=timezone.utc):%Y-%m-%d %H:%M:%S} UTC"
+        + (f", holding {', '.join(held)}" if held else ""))
+    _mirror(*STATES)   # before the engine threads start: no locks needed
+    return True
+
+def _report_first_tick():
+    global first_tick_seconds
+    first_tick_seconds = round(time.perf_counter() - BOOT_T0, 3)
+    instrument.gauge("startup_seconds", first_tick_seconds, phase="first_tick")
+    log(f"[startup] first tick {first_tick_seconds:.2f}s after boot (import {IMPORT_SECONDS:.2f}s, "
+        f"engine start {ENGINE_STARTED - BOOT_T0:.2f}s)")
+
+_last_reconcile = 0.0
+
 def main_loop():
-    global metrics_started
-    backoff=5
+    global metrics_started, _last_reconcile
     while True:
         try:
             if keys_missing():
                 time.sleep(3); continue
-            reset_daily_if_needed()
-            df=get_klines()
-            if not safe_df(df):
-                log("No market data, retry")
-                time.sleep(backoff); backoff=min(backoff*2,60); continue
-            backoff=5
-            compute_indicators(df)
-            price = float(df['close'].iloc[-1])
-            if not position_open:
-                sig, why = signal(df)
-                if sig:
-                    qty = calc_qty(price)
-                    place_order(sig, qty, price)
-                    log(f"signal={sig} reason={why} qty={qty:.4f}")
-            else:
-                update_pnl()
+            st, wait = SCHED.next()
+            if wait > 0: time.sleep(wait)
+            try: delay = tick(st)
+            except Exception as e:
+                log(f"[loop] {st.symbol} error: {e}", "error"); delay = 5
+            SCHED.done(st, delay)
+            if time.monotonic() - _last_reconcile > RECONCILE_EVERY: _last_reconcile = time.monotonic(); reconcile()
+            if delay is None and first_tick_seconds is None: _report_first_tick()   # first evaluated tick
+            if _snapshot_due or time.monotonic() - _last_snapshot > SNAPSHOT_EVERY: save_snapshot()
             if not metrics_started:
                 try: start_metrics_logger_plus(30); print_snapshot_plus(); metrics_started=True
-                except Exception as e: log(f"[metrics] start err: {e}")
-            time.sleep(10)
+                except Exception as e: log(f"[metrics] start err: {e}", "error")
         except Exception as e:
-            log(f"[loop] error: {e}")
+            log(f"[loop] error: {e}", "error")
             time.sleep(5)
 
 def keep_alive():
@@ -245,10 +679,50 @@ def keep_alive():
         try:
             url=os.getenv("RENDER_EXTERNAL_URL") or ""
             if url:
-                import requests as R; R.get(url, timeout=5); log("Keep-alive ping sent")
+                import requests as R; R.get(url, timeout=5); log("Keep-alive ping sent", "debug")
         except Exception: pass
         time.sleep(60)
 
+# ---- Engine runner ----
+# Importing main only builds state and routes; the engine (journal seed, snapshot,
+# feed, trading loop) runs where start_engine() is called: gunicorn.conf.py's
+# post_worker_init, `python main.py [--engine]` or fake_exchange's loadtest.
+ENGINE_STARTED = None
+first_tick_seconds = None
+_engine_lock = None
+
+def _take_engine_lock():
+    global _engine_lock
+    if not ENGINE_LOCK: return True
+    try: import fcntl
+    except ImportError: return True   # no flock (Windows): single-process runs only
+    f = open(ENGINE_LOCK, "a+")
+    try: fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        f.close(); return False
+    f.seek(0); f.truncate(); f.write(f"{os.getpid()}\n"); f.flush()
+    _engine_lock = f                  # held until this process exits; a restarted worker takes over
+    return True
+
+def start_engine():
+    """Start the trading engine unless another process on this host runs it; True if this one does."""
+    global ENGINE_STARTED
+    if ENGINE_STARTED is not None: return True
+    if ENGINE == "off": return False
+    if not _take_engine_lock():
+        log(f"[engine] pid {os.getpid()}: {ENGINE_LOCK} is held by another process; not trading, "
+            "this process serves an empty dashboard (run a single worker)", "warn"); return False
+    ENGINE_STARTED = time.perf_counter()
+    if JOURNAL:
+        warm_from_journal(); JOURNAL.start_compactor(600, log)
+    load_snapshot()   # overrides the journal seed: forming bar, indicator state, positions, breakers
+    Thread(target=keep_alive, daemon=True).start()
+    if EXITS: EXITS.start()
+    if FEED is not None: FEED.start()
+    Thread(target=main_loop, daemon=True).start()
+    log(f"[engine] pid {os.getpid()}: started {ENGINE_STARTED - BOOT_T0:.2f}s after boot")
+    return True
+
 # Routes
 SETUP_HTML = """<!doctype html><html><head><meta charset="utf-8"/><meta name="viewport" content="width=device-width,initial-scale=1.0"/>
 <title>Setup BingX Futures</title></head><body style="font-family:system-ui;margin:24px">
@@ -270,7 +744,8 @@ SETUP_HTML = """<!doctype html><html><head><meta charset="utf-8"/><meta name="vi
 @app.route("/", methods=["GET"])
 def home():
     if keys_missing(): return redirect("/setup")
-    return jsonify(status="ok", mode=TRADE_MODE, core=HAVE_CORE, tf=INTERVAL)
+    return jsonify(status="ok", mode=TRADE_MODE, core=HAVE_CORE, tf=INTERVAL, symbols=SYMBOLS,
+                   engine=ENGINE_STARTED is not None, first_tick_s=first_tick_seconds)
 
 @app.route("/health")
 def health(): return jsonify(ok=True, ts=datetime.utcnow().isoformat()+"Z")
@@ -291,8 +766,13 @@ def setup():
         return redirect("/metrics")
     return render_template_string(SETUP_HTML)
 
-Thread(target=keep_alive, daemon=True).start()
-Thread(target=main_loop, daemon=True).start()
+IMPORT_SECONDS = time.perf_counter() - BOOT_T0
+instrument.gauge("startup_seconds", round(IMPORT_SECONDS, 3), phase="import")
 
 if __name__ == "__main__":
+    if "--engine" in sys.argv[1:]:
+        # engine without the web app (no dashboard: it only shows the state of its own process)
+        if not start_engine(): sys.exit("engine already running (ENGINE_LOCK) or ENGINE=off")
+        while True: time.sleep(3600)
+    start_engine()
     app.run(host="0.0.0.0", port=int(os.getenv("PORT",8000)))
@@ -0,0 +1,64 @@
+"""
+metrics_stream.py
+-----------------
+Fan-out broadcaster behind the /metrics/stream Server-Sent Events endpoint.
+
+The trading loop publishes one already-serialized diff per snapshot version; the
+cost is one append per connected client. Every client owns a bounded queue: a
+slow client loses its oldest frames instead of growing memory or back-pressuring
+the publisher, and is sent a full snapshot again before its next diff.
+"""
+import threading
+from collections import deque
+
+class Client:
+    __slots__ = ("queue", "event", "lagged")
+    def __init__(self, maxlen):
+        self.queue=deque(maxlen=maxlen); self.event=threading.Event(); self.lagged=False
+
+class Broadcaster:
+    def __init__(self, maxlen=32):
+        self.maxlen=maxlen
+        self.clients=set(); self.lock=threading.Lock()
+        self.published=self.dropped=0
+
+    def subscribe(self):
+        c = Client(self.maxlen)
+        with self.lock: self.clients.add(c)
+        return c
+
+    def unsubscribe(self, c):
+        with self.lock: self.clients.discard(c)
+
+    def publish(self, frame: str):
+        self.published += 1
+        with self.lock: clients = list(self.clients)
+        for c in clients:
+            if len(c.queue) == c.queue.maxlen:
+                c.lagged = True; self.dropped += 1   # deque drops the oldest frame
+            c.queue.append(frame)
+            c.event.set()
+
+    def frames(self, c, snapshot, heartbeat=15.0):
+        """
+        SSE generator for one client. `snapshot()` returns (version, json) of the full
+        state; it is sent on connect and again after the client lagged.
+        """
+        try:
+            c.lagged = True
+            while True:
+                if c.lagged:
+                    c.lagged = False; c.queue.clear()
+                    version, body = snapshot()
+                    yield f"event: snapshot\nid: {version}\ndata: {body}\n\n"
+                while c.queue and not c.lagged:
+                    yield c.queue.popleft()
+                if not c.queue and not c.lagged:
+                    c.event.clear()
+                    if not c.queue and not c.event.wait(heartbeat):
+                        yield ": keep-alive\n\n"
+        finally:
+            self.unsubscribe(c)
+
+    def stats(self):
+        return dict(clients=len(self.clients), published=self.published, dropped=self.dropped)
@@ -0,0 +1,98 @@
+"""
+optimizer.py
+------------
+Grid / random search over the strategy thresholds (backtest.DEFAULTS) on a
+ProcessPoolExecutor.
+
+None of the swept values change an indicator window, so indicators are computed
+once in the parent. Candles + indicator series are packed into one float64 block
+in shared memory; workers map it read-only (zero-copy) and only evaluate the
+cheap per-combination parts: signal masks and the fill simulation. Combinations
+are sent in chunks to keep IPC per task negligible, so the sweep scales with cores.
+
+Usage:
+    python optimizer.py data/DOGE_15m.csv --grid adx_min=10,15,20 rsi_hi=65,70,75 tp1_atr=1,1.2,1.5
+    python optimizer.py data/DOGE_15m.csv --random 10000 --grid adx_min=10:30 sl_atr=0.8:2 --workers 8
+"""
+import os, time, random, argparse, itertools
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import backtest as BT
+
+COLUMNS = ("open","high","low","close","ema20","ema50","ema200","rsi","atr","adx","bb_width","range_pct")
+_W = {}   # worker globals: shm handle + column views
+
+def _pack(df, ind):
+    cols = [np.asarray(df[k], dtype=float) for k in COLUMNS[:4]] + [ind[k] for k in COLUMNS[4:]]
+    shm = shared_memory.SharedMemory(create=True, size=len(COLUMNS)*len(df)*8)
+    block = np.ndarray((len(COLUMNS), len(df)), dtype=np.float64, buffer=shm.buf)
+    for i, col in enumerate(cols): block[i] = col
+    return shm
+
+def _attach(name, n):
+    shm = shared_memory.SharedMemory(name=name)
+    block = np.ndarray((len(COLUMNS), n), dtype=np.float64, buffer=shm.buf)
+    block.flags.writeable = False
+    _W["shm"] = shm
+    _W["cols"] = {k: block[i] for i, k in enumerate(COLUMNS)}
+
+def _evaluate(chunk, initial):
+    cols = _W["cols"]; out = []
+    for p in chunk:
+        r = BT.simulate(cols, cols, BT.signals(cols, cols, p), p, initial)
+        r.pop("log"); out.append({**p, **r})
+    return out
+
+def combos_grid(space):
+    keys = list(space)
+    return [dict(zip(keys, vals)) for vals in itertools.product(*(space[k] for k in keys))]
+
+def combos_random(space, n, seed=0):
+    rnd = random.Random(seed)
+    def pick(v): return rnd.uniform(*v) if isinstance(v, tuple) else rnd.choice(v)
+    return [{k: pick(v) for k, v in space.items()} for _ in range(n)]
+
+def sweep(df, combos, workers=None, chunk=64, initial=1000.0):
+    """Evaluate every params dict in `combos` over df; results sorted by pnl (best first)."""
+    ind = BT.indicators(df)
+    shm = _pack(df, ind)
+    try:
+        chunks = [combos[i:i+chunk] for i in range(0, len(combos), chunk)]
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count(),
+                                 initializer=_attach, initargs=(shm.name, len(df))) as ex:
+            results = [r for part in ex.map(_evaluate, chunks, itertools.repeat(initial)) for r in part]
+    finally:
+        shm.close(); shm.unlink()
+    return sorted(results, key=lambda r: r["pnl"], reverse=True)
+
+def _parse_space(items):
+    space = {}
+    for it in items:
+        k, v = it.split("=", 1)
+        if k not in BT.DEFAULTS: raise SystemExit(f"unknown parameter: {k}")
+        space[k] = tuple(float(x) for x in v.split(":")) if ":" in v else [float(x) for x in v.split(",")]
+    return space
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Parallel parameter sweep over backtest.DEFAULTS")
+    ap.add_argument("file")
+    ap.add_argument("--grid", nargs="+", default=[], help="key=v1,v2,... (grid) or key=lo:hi (random only)")
+    ap.add_argument("--random", type=int, default=0, help="sample N random combinations instead of the full grid")
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--top", type=int, default=20)
+    ap.add_argument("--out", default="", help="write all results as CSV")
+    a = ap.parse_args()
+    space = _parse_space(a.grid)
+    if a.random: combos = combos_random(space, a.random)
+    elif any(isinstance(v, tuple) for v in space.values()): raise SystemExit("lo:hi ranges need --random N")
+    else: combos = combos_grid(space)
+    df = BT.load_candles(a.file)
+    t0 = time.perf_counter(); res = sweep(df, combos, a.workers)
+    print(f"{len(combos)} combinations over {len(df)} bars in {time.perf_counter()-t0:.1f}s")
+    for r in res[:a.top]:
+        ps = " ".join(f"{k}={r[k]:g}" for k in space)
+        print(f"{ps} | trades={r['trades']} win={r['win_rate']*100:.1f}% pnl={r['pnl']:.2f} maxDD={r['max_drawdown_pct']:.1f}%")
+    if a.out:
+        import pandas as pd
+        pd.DataFrame(res).to_csv(a.out, index=False)
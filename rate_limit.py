@@ -0,0 +1,141 @@
+"""
+rate_limit.py
+-------------
+One token bucket in front of every exchange call, shared by all threads and the
+asyncio core.
+
+Calls are classed ORDER > BALANCE > MARKET and cost their endpoint's weight.
+A class never takes tokens while a higher class is waiting, and may not drain
+the bucket below its reserve, so a burst of candle fetches always leaves room for
+an order. Callers that can simply come back later (market data) pass `max_wait`:
+instead of sleeping they get `Deferred(wait)` and the symbol scheduler re-queues
+them.
+
+    RL = RateLimiter(rate=10, burst=10)
+    @RL.limit("fetch_balance")
+    def core_fetch_balance(): ...
+    client = RL.wrap(exchange)                # create_order etc. through the bucket
+
+Exported: ratelimit_queue_depth{priority}, ratelimit_wait_seconds{priority},
+ratelimit_deferred_total{priority,endpoint}, ratelimit_tokens.
+"""
+import time, asyncio, functools, threading
+import instrument
+
+ORDER, BALANCE, MARKET = 0, 1, 2
+PRIORITY_NAMES = ("order", "balance", "market")
+
+# endpoint -> (priority class, weight); weights are relative request costs
+ENDPOINTS = dict(
+    create_order=(ORDER, 1), create_orders=(ORDER, 2), cancel_all_orders=(ORDER, 1), set_leverage=(ORDER, 1),
+    fetch_balance=(BALANCE, 2), fetch_positions=(BALANCE, 2), fetch_my_trades=(BALANCE, 2),
+    fetch_ohlcv=(MARKET, 1),
+)
+
+class Deferred(Exception):
+    """Not worth waiting for a token now; retry after `wait` seconds."""
+    def __init__(self, endpoint, wait):
+        super().__init__(f"{endpoint} deferred {wait:.2f}s (rate limit)")
+        self.endpoint=endpoint; self.wait=wait
+
+class RateLimiter:
+    def __init__(self, rate=10.0, burst=10.0, reserve=(0.0, 0.1, 0.3), endpoints=ENDPOINTS, clock=time.monotonic):
+        self.rate=rate; self.burst=burst; self.reserve=[r*burst for r in reserve]   # fractions of burst
+        self.endpoints=endpoints; self.clock=clock
+        self.tokens=burst; self.stamp=clock()
+        self.waiting=[0, 0, 0]
+        self.granted=[0, 0, 0]; self.deferred=[0, 0, 0]; self.waited=[0.0, 0.0, 0.0]
+        self.lock=threading.Lock()
+
+    def _try(self, prio, weight):
+        """Take `weight` tokens if allowed; returns 0.0, else seconds until it might be."""
+        with self.lock:
+            now = self.clock()
+            self.tokens = min(self.burst, self.tokens + (now - self.stamp)*self.rate); self.stamp = now
+            if any(self.waiting[p] for p in range(prio)): return 1.0/self.rate
+            short = weight + self.reserve[prio] - self.tokens
+            if short <= 0:
+                self.tokens -= weight; self.granted[prio] += 1
+                instrument.gauge("ratelimit_tokens", round(self.tokens, 3))
+                return 0.0
+            return short/self.rate
+
+    def _enter(self, prio, delta):
+        with self.lock:
+            self.waiting[prio] += delta
+            instrument.gauge("ratelimit_queue_depth", self.waiting[prio], priority=PRIORITY_NAMES[prio])
+
+    def _defer(self, endpoint, prio, wait):
+        self.deferred[prio] += 1
+        instrument.inc("ratelimit_deferred_total", priority=PRIORITY_NAMES[prio], endpoint=endpoint)
+        return Deferred(endpoint, wait)
+
+    def _done(self, prio, t0):
+        w = self.clock() - t0; self.waited[prio] += w
+        instrument.observe("ratelimit_wait_seconds", w, priority=PRIORITY_NAMES[prio])
+
+    def acquire(self, endpoint, max_wait=None):
+        prio, weight = self.endpoints[endpoint]
+        t0 = self.clock()
+        wait = self._try(prio, weight)
+        if wait and max_wait is not None and wait > max_wait: raise self._defer(endpoint, prio, wait)
+        if wait:
+            self._enter(prio, 1)
+            try:
+                while wait:
+                    if max_wait is not None and self.clock() - t0 + wait > max_wait:
+                        raise self._defer(endpoint, prio, wait)
+                    time.sleep(min(wait, 0.05))   # short naps: a higher class may arrive meanwhile
+                    wait = self._try(prio, weight)
+            finally:
+                self._enter(prio, -1)
+        self._done(prio, t0)
+
+    async def aacquire(self, endpoint, max_wait=None):
+        prio, weight = self.endpoints[endpoint]
+        t0 = self.clock()
+        wait = self._try(prio, weight)
+        if wait and max_wait is not None and wait > max_wait: raise self._defer(endpoint, prio, wait)
+        if wait:
+            self._enter(prio, 1)
+            try:
+                while wait:
+                    if max_wait is not None and self.clock() - t0 + wait > max_wait:
+                        raise self._defer(endpoint, prio, wait)
+                    await asyncio.sleep(min(wait, 0.05))
+                    wait = self._try(prio, weight)
+            finally:
+                self._enter(prio, -1)
+        self._done(prio, t0)
+
+    def limit(self, endpoint, max_wait=None):
+        """Decorator: acquire before every call (sync or coroutine function)."""
+        def deco(fn):
+            if asyncio.iscoroutinefunction(fn):
+                @functools.wraps(fn)
+                async def aw(*a, **k):
+                    await self.aacquire(endpoint, max_wait); return await fn(*a, **k)
+                return aw
+            @functools.wraps(fn)
+            def w(*a, **k):
+                self.acquire(endpoint, max_wait); return fn(*a, **k)
+            return w
+        return deco
+
+    def wrap(self, client): return Limited(client, self)
+
+    def stats(self):
+        return {n: dict(waiting=self.waiting[i], granted=self.granted[i], deferred=self.deferred[i],
+                        wait_s=round(self.waited[i], 3)) for i, n in enumerate(PRIORITY_NAMES)} | dict(tokens=round(self.tokens, 2))
+
+class Limited:
+    """Proxy whose known endpoints acquire tokens first; everything else passes through."""
+    def __init__(self, client, limiter):
+        self._client=client; self._limiter=limiter
+        self.id=getattr(client, "id", None) or getattr(client, "__name__", None) or type(client).__name__
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if name not in self._limiter.endpoints or not callable(attr): return attr
+        def call(*a, **k):
+            self._limiter.acquire(name); return attr(*a, **k)
+        return call
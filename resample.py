@@ -0,0 +1,58 @@
+"""
+resample.py
+-----------
+Higher timeframes built from the base candle stream, with their own indicator
+state, so a 1h/4h filter costs no extra fetch_ohlcv calls.
+
+    h4 = Resampled("4h", "15m")
+    h4.sync(store.ts, store.ohlcv)     # every tick, after the base window refreshed
+    h4.values["ema50"], h4.trend()
+
+Buckets are aligned to UTC epoch multiples of the higher timeframe (as on the
+exchange). Each sync re-aggregates only the base bars of the forming higher bar
+(plus any newer buckets) and feeds them to a StreamingIndicators engine, which
+commits a higher bar once a newer bucket shows up. The base window (500 bars of
+15m = ~31 bars of 4h) is too short to warm slow indicators, so `sync` can first be
+called with a longer history, e.g. from the journal.
+"""
+import numpy as np
+from candle_store import timeframe_ms
+from indicators_stream import StreamingIndicators
+
+class Resampled:
+    def __init__(self, timeframe, base_timeframe):
+        self.timeframe=timeframe
+        self.tf_ms=timeframe_ms(timeframe); base_ms=timeframe_ms(base_timeframe)
+        if self.tf_ms <= base_ms or self.tf_ms % base_ms:
+            raise ValueError(f"{timeframe} is not a multiple of {base_timeframe}")
+        self.ratio=self.tf_ms // base_ms
+        self.ind=StreamingIndicators()
+
+    @property
+    def values(self): return self.ind.values
+
+    @property
+    def bars(self): return self.ind.bars          # closed higher-timeframe bars seen
+
+    def sync(self, ts, ohlcv):
+        """Fold base bars (ascending ts / [n, 5] views) into higher bars; returns bars updated."""
+        n = len(ts)
+        if not n: return 0
+        start = 0 if self.ind.forming is None else int(np.searchsorted(ts, self.ind.forming[0], "left"))
+        if start >= n: return 0
+        t = ts[start:]; px = ohlcv[start:]
+        buckets = t - t % self.tf_ms
+        cut = np.flatnonzero(buckets[1:] != buckets[:-1]) + 1
+        lo = np.r_[0, cut]; hi = np.r_[cut, len(t)]
+        o = px[lo, 0]; c = px[hi - 1, 3]
+        h = np.maximum.reduceat(px[:, 1], lo); l = np.minimum.reduceat(px[:, 2], lo)
+        v = np.add.reduceat(px[:, 4], lo)
+        for row in zip(buckets[lo].tolist(), o.tolist(), h.tolist(), l.tolist(), c.tolist(), v.tolist()):
+            self.ind.update(list(row))
+        return len(lo)
+
+    def trend(self):
+        """+1 / -1 from EMA20 vs EMA50 of the higher timeframe; 0 while not warmed up."""
+        e20 = self.values.get("ema20"); e50 = self.values.get("ema50")
+        if e20 is None or e50 is None or e20 != e20 or e50 != e50: return 0
+        return 1 if e20 > e50 else -1 if e20 < e50 else 0
@@ -1,37 +1,135 @@
-import time, functools, threading
+import time, asyncio, functools, threading
+from collections import deque
+import instrument
+from rate_limit import Deferred
+
+STATES = {"closed": 0, "half_open": 1, "open": 2}
 
 class CircuitBreaker:
-    def __init__(self, max_failures=5, reset_after=60):
+    """
+    closed -> open on `max_failures` consecutive failures, on a failure rate of at
+    least `failure_rate` over the last `window` seconds, or when the window's p95
+    latency exceeds `latency_budget`. After `reset_after` seconds it goes half-open:
+    one probe call is let through, success closes it, failure opens it again.
+    Rate and latency trips need `min_calls` calls in the window: size `window` to the
+    call rate so that many calls fit in it (a breaker on a call made every 30 s needs
+    minutes, not 60 s).
+    """
+    def __init__(self, max_failures=5, reset_after=60, name="default",
+                 window=60.0, min_calls=10, failure_rate=0.5, latency_budget=None, clock=time.time):
         self.max_failures=max_failures
         self.reset_after=reset_after
+        self.name=name
+        self.window=window; self.min_calls=min_calls
+        self.failure_rate=failure_rate; self.latency_budget=latency_budget
+        self.clock=clock
         self.failures=0
-        self.open_until=0.0
+        self.open_until=0.0          # non-zero while open or half-open
+        self.probing=False
+        self.calls=deque()           # (time, ok, seconds)
         self.lock=threading.Lock()
+    @property
+    def state(self):
+        if not self.open_until: return "closed"
+        return "open" if self.clock() < self.open_until and not self.probing else "half_open"
+    def _gauge(self): instrument.gauge("circuit_state", STATES[self.state], breaker=self.name)
     def allow(self):
         with self.lock:
-            now=time.time()
-            if now < self.open_until: return False
-            return True
-    def on_success(self):
+            now=self.clock()
+            if not self.open_until: return True
+            if now >= self.open_until and not self.probing:
+                self.probing=True; self._gauge()
+                instrument.inc("circuit_probes_total", breaker=self.name)
+                return True
+            instrument.inc("circuit_rejections_total", breaker=self.name)
+            return False
+    def release(self):
+        """The allowed call never reached the exchange (deferred): free the probe slot."""
+        with self.lock: self.probing=False
+    def _trip(self, reason):
+        self.open_until=self.clock()+self.reset_after
+        self.failures=0; self.probing=False; self.calls.clear()
+        instrument.inc("circuit_trips_total", breaker=self.name, reason=reason)
+        self._gauge()
+    def _record(self, ok, seconds):
+        now=self.clock(); self.calls.append((now, ok, seconds))
+        while self.calls and self.calls[0][0] < now - self.window: self.calls.popleft()
+        if seconds is not None: instrument.observe("circuit_call_seconds", seconds, breaker=self.name)
+    def _p95(self):
+        lat=sorted(s for _, _, s in self.calls if s is not None)
+        return lat[int(0.95*(len(lat)-1))] if len(lat) >= self.min_calls else None
+    def on_success(self, seconds=None):
         with self.lock:
-            self.failures=0; self.open_until=0.0
-    def on_failure(self):
+            self._record(True, seconds)
+            if self.probing:
+                self.open_until=0.0; self.probing=False; self.failures=0; self._gauge(); return
+            self.failures=0
+            if self.latency_budget is not None:
+                p95=self._p95()
+                if p95 is not None and p95 > self.latency_budget: self._trip("latency")
+    def on_failure(self, seconds=None):
         with self.lock:
+            self._record(False, seconds)
+            if self.probing: self._trip("probe"); return
             self.failures+=1
-            if self.failures>=self.max_failures:
-                self.open_until=time.time()+self.reset_after
-                self.failures=0
-def retry(fn=None, tries=3, delay=0.5, backoff=2.0):
+            if self.failures>=self.max_failures: self._trip("failures"); return
+            n=len(self.calls)
+            if n >= self.min_calls and sum(1 for _, ok, _ in self.calls if not ok)/n >= self.failure_rate:
+                self._trip("failure_rate")
+    def stats(self):
+        with self.lock:
+            n=len(self.calls); bad=sum(1 for _, ok, _ in self.calls if not ok)
+            return dict(state=self.state, calls=n, failure_rate=round(bad/n, 3) if n else 0.0, p95=self._p95(),
+                        open_for=round(max(0.0, self.open_until-self.clock()), 1) if self.open_until else 0.0)
+
+def retry(fn=None, tries=3, delay=0.5, backoff=2.0, deadline=None, timeout=None):
+    """
+    `deadline`: total seconds for all attempts and sleeps; no new attempt starts
+    once the next sleep would cross it. `timeout`: per-attempt limit, enforced for
+    coroutine functions (asyncio.wait_for); sync attempts cannot be interrupted.
+    """
     if fn is None:
-        return lambda f: retry(f, tries=tries, delay=delay, backoff=backoff)
+        return lambda f: retry(f, tries=tries, delay=delay, backoff=backoff, deadline=deadline, timeout=timeout)
+    name=fn.__name__
+    def _give_up(start, _delay):
+        if deadline is not None and time.perf_counter()-start+_delay > deadline:
+            instrument.inc("retry_deadline_exceeded_total", fn=name); return True
+        return False
+    if asyncio.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def awrapper(*a, **k):
+            _tries=tries; _delay=delay; start=time.perf_counter()
+            while True:
+                t0=time.perf_counter()
+                try:
+                    if timeout is None: return await fn(*a, **k)
+                    return await asyncio.wait_for(fn(*a, **k), timeout)
+                except Deferred:
+                    raise   # the scheduler re-queues it; no point sleeping here
+                except Exception:
+                    _tries-=1
+                    if _tries<=0 or _give_up(start, _delay):
+                        instrument.inc("retry_exhausted_total", fn=name); raise
+                    instrument.inc("retries_total", fn=name)
+                    await asyncio.sleep(_delay); _delay*=backoff
+                finally:
+                    instrument.observe("attempt_seconds", time.perf_counter()-t0, fn=name)
+        return awrapper
     @functools.wraps(fn)
     def wrapper(*a, **k):
-        _tries=tries; _delay=delay
+        _tries=tries; _delay=delay; start=time.perf_counter()
         while _tries>0:
+            t0=time.perf_counter()
             try:
                 return fn(*a, **k)
+            except Deferred:
+                raise   # the scheduler re-queues it; no point sleeping here
             except Exception as e:
                 _tries-=1
-                if _tries<=0: raise
+                if _tries<=0 or _give_up(start, _delay):
+                    instrument.inc("retry_exhausted_total", fn=name); raise
+                instrument.inc("retries_total", fn=name)
                 time.sleep(_delay); _delay*=backoff
+            finally:
+                instrument.observe("attempt_seconds", time.perf_counter()-t0, fn=name)
     return wrapper
@@ -0,0 +1,32 @@
+"""
+scheduler.py
+------------
+One loop for many symbols. Each state is due every `period` seconds; the first
+dues are staggered across the period and consecutive fetches are spaced at least
+1/max_rps apart, so N symbols never burst the exchange's market-data rate limit
+(if N/period exceeds max_rps the cycle simply stretches to N/max_rps).
+"""
+import heapq, time
+
+class SymbolScheduler:
+    def __init__(self, states, period=10.0, max_rps=5.0, clock=time.monotonic):
+        self.period=period; self.gap=1.0/max_rps; self.clock=clock
+        now=clock(); n=max(len(states),1)
+        self._idx={id(st): i for i, st in enumerate(states)}
+        self.heap=[(now + i*period/n, i, st) for i, st in enumerate(states)]
+        heapq.heapify(self.heap)
+        self.next_slot=now
+
+    def __len__(self): return len(self.heap)
+
+    def next(self):
+        """Pop the next due state. Returns (state, seconds to wait before scanning it)."""
+        due, i, st = heapq.heappop(self.heap)
+        start = max(due, self.next_slot)
+        self.next_slot = start + self.gap
+        return st, max(0.0, start - self.clock())
+
+    def done(self, st, delay=None):
+        """Re-queue a state popped by next(); `delay` overrides the period (backoff)."""
+        due = self.clock() + (self.period if delay is None else delay)
+        heapq.heappush(self.heap, (due, self._idx[id(st)], st))
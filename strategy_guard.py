@@ -31,6 +31,8 @@ Notes:
   * market with takeProfitPrice / stopLossPrice
 - If SL+TP could not be **accepted by the exchange**, the entry is **not sent**.
 - If entry fails AFTER protections were placed, it cancels protections to avoid stale orders.
+- Execution lives in `execution.py`: TP and SL are sent in parallel (or as one batch order
+  once the accepted shapes are cached per symbol) and every phase is timed.
 """
 
 from typing import Tuple
@@ -41,21 +43,6 @@ def _reduce_side(side: str) -> str:
 def _entry_side(side: str) -> str:
     return 'buy' if side == 'long' else 'sell'
 
-def _place_any(exchange, symbol, specs, qty):
-    """
-    Try a sequence of order specs until one succeeds.
-    Returns (success: bool, last_error: str)
-    """
-    last_err = ""
-    for s in specs:
-        try:
-            exchange.create_order(symbol, s['type'], s['side'], qty, params=s['params'])
-            return True, ""
-        except Exception as e:
-            last_err = f"{type(e).__name__}: {e}"
-            continue
-    return False, last_err
-
 def _build_protective_specs(side: str, tp1: float, sl: float):
     reduce_side = _reduce_side(side)
     return [
@@ -84,7 +71,7 @@ def enter_trade_protected(exchange_or_core, symbol: str, side: str, qty: float,
     """
     Workflow:
       1) Compute TP1 & SL using ATR
-      2) Place protective orders (TP1 + SL) as reduceOnly conditionals
+      2) Place protective orders (TP1 + SL) as reduceOnly conditionals, concurrently
       3) If BOTH protections accepted -> send the entry order
       4) If entry fails -> cancel protections and fail safely
 
@@ -96,24 +83,6 @@ def enter_trade_protected(exchange_or_core, symbol: str, side: str, qty: float,
     tp1 = entry_price + 1.2*atr if side == 'long' else entry_price - 1.2*atr
     sl  = entry_price - 1.2*atr if side == 'long' else entry_price + 1.2*atr
 
-    tp_specs, sl_specs = _build_protective_specs(side, tp1, sl)
-
-    # (1) TP first
-    ok_tp, err_tp = _place_any(exchange_or_core, symbol, tp_specs, qty)
-    if not ok_tp:
-        return False, f"TP rejected by exchange ({err_tp})"
-
-    # (2) SL second
-    ok_sl, err_sl = _place_any(exchange_or_core, symbol, sl_specs, qty)
-    if not ok_sl:
-        # cleanup TP we just placed
-        _cancel_safely(exchange_or_core, symbol)
-        return False, f"SL rejected by exchange ({err_sl})"
-
-    # (3) Entry
-    try:
-        exchange_or_core.create_order(symbol, 'market', _entry_side(side), qty, params={'reduceOnly': False})
-        return True, f"{side} with TP={tp1:.6f} & SL={sl:.6f} confirmed"
-    except Exception as e:
-        _cancel_safely(exchange_or_core, symbol)
-        return False, f"entry failed after protections ({type(e).__name__}: {e})"
+    # TP and SL go out together (batched once their shapes are known), then the entry
+    from execution import Executor
+    return tuple(Executor(exchange_or_core).enter_protected(symbol, side, qty, tp1, sl))
@@ -0,0 +1,52 @@
+"""
+symbol_state.py
+---------------
+Per-symbol trading state: candle window, indicator engine, market values and the
+position, under the same names main.py used for its module globals (so one state
+can be mirrored back onto them for the dashboard / metrics logger).
+"""
+import threading
+from candle_store import CandleStore
+from indicators_stream import StreamingIndicators
+from resilience import CircuitBreaker
+from resample import Resampled
+
+MIRRORED = ("current_price","update_time","rsi_value","adx_value","ema_200_value","current_atr",
+            "price_range_value","bb_width","supertrend_dir_value","ema20_value","ema50_value",
+            "position_open","position_side","entry_price","tp1_price","tp2_price","sl_price",
+            "current_pnl","trailing_active")
+
+class SymbolState:
+    def __init__(self, symbol, timeframe, size=500, higher=()):
+        self.symbol=symbol; self.timeframe=timeframe
+        self.store=CandleStore(symbol, timeframe, size)
+        self.ind=StreamingIndicators()
+        self.htf={tf: Resampled(tf, timeframe) for tf in higher}   # built from the base window
+        self.cb_ohlcv=CircuitBreaker(5, 60, "ohlcv", window=300, min_calls=5, latency_budget=2.0)   # 1 call per scan period
+        self.backoff=5
+        self.lock=threading.Lock()   # REST scheduler and websocket feed both write the window
+        self.last_eval=0.0; self.needs_rest=False
+        self.archived_ts=0           # newest closed bar written to the journal
+        self.last_signal=None        # side of the signal standing at the last evaluation
+        # market
+        self.current_price=0.0; self.update_time=""
+        self.rsi_value=self.adx_value=self.ema_200_value=self.current_atr=0.0
+        self.price_range_value=None; self.bb_width=None; self.supertrend_dir_value=None
+        self.ema20_value=None; self.ema50_value=None
+        # position
+        self.position_open=False; self.position_side="N/A"; self.qty=0.0
+        self.entry_price=self.tp1_price=self.tp2_price=self.sl_price=self.current_pnl=0.0
+        self.trailing_active=False; self.trade_pnl=0.0   # realized by partial exits of this trade
+        self.protection=None         # (tp, sl, entry bar ts) resting on the exchange since the entry
+
+    def close(self):
+        self.position_open=False; self.position_side="N/A"; self.qty=0.0
+        self.entry_price=self.tp1_price=self.tp2_price=self.sl_price=self.current_pnl=0.0
+        self.trailing_active=False; self.trade_pnl=0.0   # realized by partial exits of this trade
+        self.protection=None         # (tp, sl, entry bar ts) resting on the exchange since the entry
+
+    def summary(self):
+        return dict(symbol=self.symbol, price=self.current_price, adx=self.adx_value, rsi=self.rsi_value,
+                    position_open=self.position_open, side=self.position_side,
+                    entry=self.entry_price, pnl=self.current_pnl, update_time=self.update_time,
+                    htf={tf: r.trend() for tf, r in self.htf.items()})
@@ -0,0 +1,59 @@
+"""
+warm_start.py
+-------------
+Binary snapshots of the trading engine so a restart resumes where it stopped.
+
+A snapshot holds, per symbol, the candle window, the streaming indicator state,
+the position and the OHLCV breaker, plus the account-level counters and breakers.
+It is pickled to `<path>.tmp`, fsynced and moved over `<path>` with os.replace, so
+a crash mid-write leaves the previous snapshot intact. Loading is best-effort:
+a missing, foreign or corrupt file just means a cold start.
+"""
+import os, time, pickle
+
+MAGIC = b"PROBOT-WS\x01"
+POSITION = ("position_open","position_side","qty","entry_price","tp1_price","tp2_price","sl_price",
+            "current_pnl","trailing_active","trade_pnl","protection")
+
+def save(path, payload):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        pickle.dump(dict(payload, saved_at=time.time()), f, protocol=pickle.HIGHEST_PROTOCOL)
+        f.flush(); os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+KEYS = {"interval", "states", "account", "leverage_set", "ledger", "exits", "breakers", "saved_at"}
+SYMBOL_KEYS = {"ts", "ohlcv", "ind", "htf", "archived_ts", "position", "cb_ohlcv"}
+
+def load(path):
+    """The snapshot dict, or None when missing, corrupt or of another layout (nothing to restore)."""
+    try:
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC: return None
+            snap = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception:
+        return None
+    if not isinstance(snap, dict) or not KEYS <= snap.keys(): return None
+    if not all(isinstance(d, dict) and SYMBOL_KEYS <= d.keys() for d in snap["states"].values()): return None
+    return snap
+
+def breaker_state(cb): return dict(failures=cb.failures, open_until=cb.open_until)
+
+def restore_breaker(cb, d):
+    with cb.lock: cb.failures=d["failures"]; cb.open_until=d["open_until"]
+
+def capture_symbol(st):
+    return dict(ts=st.store.ts.copy(), ohlcv=st.store.ohlcv.copy(), ind=st.ind, htf=st.htf, archived_ts=st.archived_ts,
+                position={k: getattr(st, k) for k in POSITION}, cb_ohlcv=breaker_state(st.cb_ohlcv))
+
+def restore_symbol(st, d):
+    st.store.load(d["ts"], d["ohlcv"])
+    st.ind = d["ind"]
+    for tf, r in d["htf"].items():
+        if tf in st.htf: st.htf[tf] = r
+    st.archived_ts = d["archived_ts"]
+    for k, v in d["position"].items(): setattr(st, k, v)
+    restore_breaker(st.cb_ohlcv, d["cb_ohlcv"])
@@ -0,0 +1,163 @@
+"""
+ws_feed.py
+----------
+Event-driven market data from BingX perpetual WebSocket streams.
+
+MarketFeed runs one thread with one socket for all symbols, subscribes to
+`<SYM>@kline_<tf>` (and optionally `<SYM>@trade`), decodes the gzip frames,
+answers pings and hands bars to `on_bars(symbol, [[ts,o,h,l,c,v], ...])` as soon
+as they arrive. Trade prints are folded into the forming bar locally (BarBuilder),
+so intra-bar wicks are seen between REST polls.
+
+The socket sits behind a tiny transport interface so it can be swapped for tests:
+    connect(); send(text); recv(timeout) -> str|bytes|None (None = timeout); close()
+`AiohttpTransport` is the real one (aiohttp ships with ccxt); `QueueTransport`
+replays queued frames in-process (`python benchmarks.py --only feed` drives the
+feed through it). When the feed is down or a symbol goes quiet,
+`healthy(symbol)` turns False and main.py falls back to REST polling.
+"""
+import gzip, json, time, queue, threading
+from candle_store import timeframe_ms
+
+BINGX_SWAP_WS = "wss://open-api-swap.bingx.com/swap-market"
+
+def ws_symbol(symbol: str) -> str:
+    """'DOGE/USDT:USDT' -> 'DOGE-USDT'"""
+    return symbol.split(":")[0].replace("/", "-")
+
+def _decode(raw):
+    if isinstance(raw, (bytes, bytearray)):
+        try: raw = gzip.decompress(raw)
+        except OSError: pass
+        raw = raw.decode("utf-8")
+    return raw
+
+class AiohttpTransport:
+    def __init__(self, url=BINGX_SWAP_WS, connect_timeout=10.0):
+        self.url=url; self.connect_timeout=connect_timeout
+        self.loop=None; self.session=None; self.ws=None
+
+    def connect(self):
+        import asyncio, aiohttp
+        self.loop = asyncio.new_event_loop()
+        async def _open():
+            self.session = aiohttp.ClientSession()
+            self.ws = await self.session.ws_connect(self.url, timeout=aiohttp.ClientWSTimeout(ws_close=self.connect_timeout))
+        self.loop.run_until_complete(asyncio.wait_for(_open(), self.connect_timeout))
+
+    def send(self, text):
+        self.loop.run_until_complete(self.ws.send_str(text))
+
+    def recv(self, timeout=1.0):
+        import asyncio, aiohttp
+        try: msg = self.loop.run_until_complete(self.ws.receive(timeout=timeout))
+        except asyncio.TimeoutError: return None
+        if msg.type in (aiohttp.WSMsgType.TEXT, aiohttp.WSMsgType.BINARY): return msg.data
+        raise ConnectionError(f"websocket closed ({msg.type.name})")
+
+    def close(self):
+        if self.loop is None: return
+        async def _close():
+            if self.ws is not None: await self.ws.close()
+            if self.session is not None: await self.session.close()
+        try: self.loop.run_until_complete(_close())
+        except Exception: pass
+        self.loop.close(); self.loop=None
+
+class QueueTransport:
+    """In-process transport: frames put on `inbox` are received, sent frames land in `sent`."""
+    def __init__(self):
+        self.inbox=queue.Queue(); self.sent=[]; self.closed=False
+    def connect(self): self.closed=False
+    def send(self, text): self.sent.append(text)
+    def recv(self, timeout=1.0):
+        try: item = self.inbox.get(timeout=timeout)
+        except queue.Empty: return None
+        if isinstance(item, Exception): raise item
+        return item
+    def close(self): self.closed=True
+
+class BarBuilder:
+    """Folds trade prints into the forming bar of one symbol/timeframe."""
+    def __init__(self, tf_ms):
+        self.tf_ms=tf_ms; self.bar=None
+    def seed(self, bar): self.bar=list(bar)
+    def on_trade(self, ts, price, qty):
+        start = ts - ts % self.tf_ms
+        b = self.bar
+        if b is None or start > b[0]:
+            self.bar = [start, price, price, price, price, qty]
+        elif start == b[0]:
+            b[2] = max(b[2], price); b[3] = min(b[3], price); b[4] = price; b[5] += qty
+        return self.bar
+
+class MarketFeed:
+    def __init__(self, symbols, timeframe, on_bars, transport_factory=AiohttpTransport,
+                 trades=False, stale_after=30.0, log=print):
+        self.symbols=list(symbols); self.timeframe=timeframe
+        self.on_bars=on_bars; self.transport_factory=transport_factory
+        self.trades=trades; self.stale_after=stale_after; self.log=log
+        self._by_ws={ws_symbol(s): s for s in self.symbols}
+        self._builders={s: BarBuilder(timeframe_ms(timeframe)) for s in self.symbols}
+        self._last={}                 # symbol -> monotonic time of last update
+        self.connected=False; self.reconnects=0; self.messages=0
+        self._stop=threading.Event(); self._thread=None
+
+    def start(self):
+        self._thread=threading.Thread(target=self._run, daemon=True, name="ws-feed"); self._thread.start()
+        return self
+
+    def stop(self): self._stop.set()
+
+    def healthy(self, symbol) -> bool:
+        return self.connected and time.monotonic() - self._last.get(symbol, -1e9) < self.stale_after
+
+    def _subscribe(self, t):
+        for i, s in enumerate(self.symbols):
+            streams = [f"{ws_symbol(s)}@kline_{self.timeframe}"] + ([f"{ws_symbol(s)}@trade"] if self.trades else [])
+            for j, dt in enumerate(streams):
+                t.send(json.dumps({"id": f"{i}-{j}", "reqType": "sub", "dataType": dt}))
+
+    def _run(self):
+        backoff = 1
+        while not self._stop.is_set():
+            t = self.transport_factory()
+            try:
+                t.connect(); self._subscribe(t)
+                self.connected=True; backoff=1
+                while not self._stop.is_set():
+                    raw = t.recv(1.0)
+                    if raw is not None: self._handle(t, _decode(raw))
+            except Exception as e:
+                self.log(f"[ws] feed error: {e}")
+            finally:
+                self.connected=False
+                try: t.close()
+                except Exception: pass
+            if self._stop.is_set(): break
+            self.reconnects += 1
+            self._stop.wait(backoff); backoff=min(backoff*2, 60)
+
+    def _handle(self, t, text):
+        if text == "Ping": t.send("Pong"); return
+        msg = json.loads(text)
+        if "ping" in msg: t.send(json.dumps({"pong": msg["ping"], "time": msg.get("time")})); return
+        dt = msg.get("dataType") or ""
+        if "@" not in dt or not msg.get("data"): return       # subscription acks etc.
+        sym = self._by_ws.get(dt.split("@")[0])
+        if sym is None: return
+        self.messages += 1
+        data = msg["data"] if isinstance(msg["data"], list) else [msg["data"]]
+        if "@kline_" in dt:
+            bars = [[int(k["T"]), float(k["o"]), float(k["h"]), float(k["l"]), float(k["c"]), float(k["v"])] for k in data]
+            bars.sort(key=lambda b: b[0])
+            self._builders[sym].seed(bars[-1])
+        elif dt.endswith("@trade"):
+            b = self._builders[sym]
+            for tr in data: b.on_trade(int(tr["T"]), float(tr["p"]), float(tr["q"]))
+            if b.bar is None: return
+            bars = [list(b.bar)]
+        else:
+            return
+        self._last[sym] = time.monotonic()
+        self.on_bars(sym, bars)